@@ -261,7 +261,7 @@ REPORTS = [
     {
         "title": "Commission Inquiry",
         "icon": "💴",
-        "desc": "Filter sales tracker by month across 20 schedules. Automated red-mark detection.",
+        "desc": "Filter one or more sales trackers by month across all schedules. Automated red-mark detection.",
         "category": "Sales & Operations",
         "category_short": "Sales",
         "page": "pages/9_💴_Commission_Inquiry.py"
@@ -0,0 +1,248 @@
+import sqlite3
+from datetime import time
+import numpy as np
+import pandas as pd
+
+HISTORY_DB = "attendance_history.db"
+
+# Defaults mirror the attendance page; callers pass their own to stay in sync
+REQUIRED_HOURS = 8.0
+LATE_THRESHOLD = time(9, 30)
+EXIT_THRESHOLD = time(17, 30)
+CHRONIC_LATE_THRESHOLD = 0.20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS punches (
+    branch TEXT NOT NULL,
+    employee TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    PRIMARY KEY (branch, employee, ts)
+);
+CREATE TABLE IF NOT EXISTS daily (
+    branch TEXT NOT NULL,
+    employee TEXT NOT NULL,
+    date TEXT NOT NULL,
+    first_in TEXT,
+    last_out TEXT,
+    work_hours REAL,
+    is_late INTEGER,
+    is_early_exit INTEGER,
+    is_compliant INTEGER,
+    note TEXT,
+    PRIMARY KEY (branch, employee, date)
+);
+CREATE TABLE IF NOT EXISTS monthly (
+    branch TEXT NOT NULL,
+    employee TEXT NOT NULL,
+    month TEXT NOT NULL,
+    present_days INTEGER,
+    late_days INTEGER,
+    early_exit_days INTEGER,
+    compliant_days INTEGER,
+    total_hours REAL,
+    PRIMARY KEY (branch, employee, month)
+);
+CREATE TABLE IF NOT EXISTS branch_month (
+    branch TEXT NOT NULL,
+    month TEXT NOT NULL,
+    open_days INTEGER,
+    PRIMARY KEY (branch, month)
+);
+"""
+
+
+def _to_timedelta(t):
+    return pd.Timedelta(hours=t.hour, minutes=t.minute, seconds=t.second, microseconds=t.microsecond)
+
+
+def summarise_punches(punches, required_hours=REQUIRED_HOURS, late_threshold=LATE_THRESHOLD, exit_threshold=EXIT_THRESHOLD):
+    """
+    Collapses raw punches (Employee, Timestamp) into one row per employee per day.
+    First punch is the entry, last punch is the exit.
+    """
+    columns = ['Employee', 'Date', 'FirstIn', 'LastOut', 'WorkHours', 'IsLate', 'IsEarlyExit', 'IsCompliant', 'Note']
+    if punches is None or punches.empty:
+        return pd.DataFrame(columns=columns)
+
+    punches = punches.assign(Date=punches['Timestamp'].dt.strftime('%Y-%m-%d'))
+    daily = punches.groupby(['Employee', 'Date'])['Timestamp'].agg(first_in='min', last_out='max').reset_index()
+
+    first_in = daily['first_in']
+    last_out = daily['last_out']
+    work_hours = (last_out - first_in).dt.total_seconds() / 3600
+
+    is_late = (first_in - first_in.dt.normalize()) > _to_timedelta(late_threshold)
+    # Anyone who did the full hours is never an early exit
+    is_early_exit = (work_hours < required_hours) & ((last_out - last_out.dt.normalize()) < _to_timedelta(exit_threshold))
+    is_compliant = (work_hours >= required_hours) & ~is_late
+
+    note = np.select(
+        [is_compliant, is_late & is_early_exit, is_late, is_early_exit],
+        ["Compliant", "Late Entry & Early Exit", "Late Entry", "Early Exit"],
+        default="Compliant"
+    )
+
+    return pd.DataFrame({
+        'Employee': daily['Employee'],
+        'Date': daily['Date'],
+        'FirstIn': first_in.dt.strftime('%H:%M:%S'),
+        'LastOut': last_out.dt.strftime('%H:%M:%S'),
+        'WorkHours': work_hours.round(1),
+        'IsLate': is_late.astype(bool),
+        'IsEarlyExit': is_early_exit.astype(bool),
+        'IsCompliant': is_compliant.astype(bool),
+        'Note': note
+    })[columns]
+
+
+def connect(db_path=HISTORY_DB):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def ingest(branch, punches, db_path=HISTORY_DB, required_hours=REQUIRED_HOURS,
+           late_threshold=LATE_THRESHOLD, exit_threshold=EXIT_THRESHOLD):
+    """
+    Appends punches (Employee, Timestamp) for a branch, skipping ones already stored.
+    Only the days and months touched by new punches are recomputed.
+    Returns the number of new punches.
+    """
+    rows = (
+        punches[['Employee', 'Timestamp']]
+        .dropna()
+        .assign(ts=lambda d: d['Timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S'))
+        [['Employee', 'ts']]
+        .drop_duplicates()
+    )
+    if rows.empty:
+        return 0
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute("CREATE TEMP TABLE staged (employee TEXT, ts TEXT)")
+            conn.executemany("INSERT INTO staged VALUES (?, ?)", rows.itertuples(index=False, name=None))
+
+            new_rows = conn.execute("""
+                SELECT s.employee, s.ts FROM staged s
+                LEFT JOIN punches p ON p.branch = ? AND p.employee = s.employee AND p.ts = s.ts
+                WHERE p.ts IS NULL
+            """, (branch,)).fetchall()
+
+            if not new_rows:
+                return 0
+
+            conn.executemany("INSERT INTO punches VALUES (?, ?, ?)", [(branch, e, ts) for e, ts in new_rows])
+
+            # Rebuild the affected days from every stored punch, not just the new ones
+            affected_days = sorted({(e, ts[:10]) for e, ts in new_rows})
+            conn.execute("CREATE TEMP TABLE touched_days (employee TEXT, date TEXT)")
+            conn.executemany("INSERT INTO touched_days VALUES (?, ?)", affected_days)
+            day_punches = pd.read_sql_query("""
+                SELECT p.employee AS Employee, p.ts AS Timestamp FROM punches p
+                JOIN touched_days t ON p.employee = t.employee AND substr(p.ts, 1, 10) = t.date
+                WHERE p.branch = ?
+            """, conn, params=(branch,))
+            day_punches['Timestamp'] = pd.to_datetime(day_punches['Timestamp'])
+
+            daily = summarise_punches(day_punches, required_hours, late_threshold, exit_threshold)
+            conn.executemany(
+                "INSERT OR REPLACE INTO daily VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (branch, r.Employee, r.Date, r.FirstIn, r.LastOut, float(r.WorkHours),
+                     int(r.IsLate), int(r.IsEarlyExit), int(r.IsCompliant), r.Note)
+                    for r in daily.itertuples(index=False)
+                ]
+            )
+
+            # Roll the touched months up again from the daily table
+            affected_months = sorted({(e, d[:7]) for e, d in affected_days})
+            conn.execute("CREATE TEMP TABLE touched_months (employee TEXT, month TEXT)")
+            conn.executemany("INSERT INTO touched_months VALUES (?, ?)", affected_months)
+            conn.execute("""
+                INSERT OR REPLACE INTO monthly
+                SELECT d.branch, d.employee, substr(d.date, 1, 7), COUNT(*),
+                       SUM(d.is_late), SUM(d.is_early_exit), SUM(d.is_compliant), SUM(d.work_hours)
+                FROM daily d
+                JOIN touched_months t ON d.employee = t.employee AND substr(d.date, 1, 7) = t.month
+                WHERE d.branch = ?
+                GROUP BY d.branch, d.employee, substr(d.date, 1, 7)
+            """, (branch,))
+            conn.execute("""
+                INSERT OR REPLACE INTO branch_month
+                SELECT branch, substr(date, 1, 7), COUNT(DISTINCT date) FROM daily
+                WHERE branch = ? AND substr(date, 1, 7) IN (SELECT DISTINCT month FROM touched_months)
+                GROUP BY branch, substr(date, 1, 7)
+            """, (branch,))
+        return len(new_rows)
+    finally:
+        conn.close()
+
+
+def list_months(branch=None, db_path=HISTORY_DB):
+    """Months that have history, newest first"""
+    conn = connect(db_path)
+    try:
+        if branch:
+            rows = conn.execute("SELECT month FROM branch_month WHERE branch = ? ORDER BY month DESC", (branch,)).fetchall()
+        else:
+            rows = conn.execute("SELECT DISTINCT month FROM branch_month ORDER BY month DESC").fetchall()
+        return [r[0] for r in rows]
+    finally:
+        conn.close()
+
+
+def load_rollup(branch, start_month, end_month, db_path=HISTORY_DB,
+                required_hours=REQUIRED_HOURS, chronic_late_threshold=CHRONIC_LATE_THRESHOLD):
+    """
+    Per-employee stats for an inclusive month range ('YYYY-MM'), read from the
+    monthly rollups. Columns match the monthly dashboard's employee stats.
+    """
+    conn = connect(db_path)
+    try:
+        stats = pd.read_sql_query("""
+            SELECT employee AS Employee, SUM(present_days) AS PresentDays,
+                   SUM(total_hours) AS TotalHours, SUM(late_days) AS LateDays,
+                   SUM(early_exit_days) AS EarlyExitDays, SUM(compliant_days) AS CompliantDays
+            FROM monthly
+            WHERE branch = ? AND month BETWEEN ? AND ?
+            GROUP BY employee
+            ORDER BY employee
+        """, conn, params=(branch, start_month, end_month))
+        open_days = conn.execute(
+            "SELECT COALESCE(SUM(open_days), 0) FROM branch_month WHERE branch = ? AND month BETWEEN ? AND ?",
+            (branch, start_month, end_month)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+    stats['AvgWorkHours'] = (stats['TotalHours'] / stats['PresentDays']).round(1)
+    stats['AttendancePct'] = (stats['PresentDays'] / open_days * 100).round(1) if open_days else 0.0
+    stats['ChronicLate'] = (stats['LateDays'] / stats['PresentDays']) >= chronic_late_threshold
+    stats['UnderHours'] = stats['AvgWorkHours'] < required_hours
+    stats['AvgDeviation'] = (stats['AvgWorkHours'] - required_hours).round(1)
+    stats['TotalRiskDays'] = stats['LateDays'] + stats['EarlyExitDays']
+    return stats.drop(columns=['TotalHours'])
+
+
+def load_trend(branch, start_month, end_month, db_path=HISTORY_DB):
+    """Branch-wide totals per month for trend charts"""
+    conn = connect(db_path)
+    try:
+        trend = pd.read_sql_query("""
+            SELECT m.month AS Month, COUNT(*) AS Employees, SUM(m.present_days) AS PresentDays,
+                   SUM(m.late_days) AS LateDays, SUM(m.early_exit_days) AS EarlyExitDays,
+                   SUM(m.total_hours) AS TotalHours, b.open_days AS OpenDays
+            FROM monthly m
+            JOIN branch_month b ON b.branch = m.branch AND b.month = m.month
+            WHERE m.branch = ? AND m.month BETWEEN ? AND ?
+            GROUP BY m.month
+            ORDER BY m.month
+        """, conn, params=(branch, start_month, end_month))
+    finally:
+        conn.close()
+
+    trend['LatePct'] = (trend['LateDays'] / trend['PresentDays'] * 100).round(1)
+    trend['AvgWorkHours'] = (trend['TotalHours'] / trend['PresentDays']).round(1)
+    return trend.drop(columns=['TotalHours'])
@@ -233,20 +233,31 @@ async function handleHrData(request, env, ctx) {
 ============================================================================ */
 
 async function loadNotion(env) {
-    const res = await fetch(
-        `https://api.notion.com/v1/databases/${env.NOTION_DB_ID}/query`,
-        {
-            method: "POST",
-            headers: {
-                "Authorization": `Bearer ${env.NOTION_TOKEN}`,
-                "Content-Type": "application/json",
-                "Notion-Version": "2022-06-28"
+    // Notion returns at most 100 rows per query; follow next_cursor for the rest
+    const results = [];
+    let cursor = undefined;
+
+    do {
+        const res = await fetch(
+            `https://api.notion.com/v1/databases/${env.NOTION_DB_ID}/query`,
+            {
+                method: "POST",
+                headers: {
+                    "Authorization": `Bearer ${env.NOTION_TOKEN}`,
+                    "Content-Type": "application/json",
+                    "Notion-Version": "2022-06-28"
+                },
+                body: JSON.stringify(cursor ? { page_size: 100, start_cursor: cursor } : { page_size: 100 })
             }
-        }
-    );
+        );
+
+        if (!res.ok) throw new Error(`Notion failed with status ${res.status}`);
+        const page = await res.json();
+        results.push(...page.results);
+        cursor = page.has_more ? page.next_cursor : undefined;
+    } while (cursor);
 
-    if (!res.ok) throw new Error(`Notion failed with status ${res.status}`);
-    return res.json();
+    return { results };
 }
 
 function mapEmployee(item) {
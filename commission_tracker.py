@@ -0,0 +1,238 @@
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import re
+import sys
+from io import BytesIO
+import openpyxl
+import pandas as pd
+import workbook_cache
+
+# Bump when parse_tracker's output changes so old cache entries stop matching
+PARSER_VERSION = "3"
+
+MASTER_SHEET = "Master File"
+HEADER_ROW = 2
+RED_FILL = 'FFC00000'
+
+# Output column -> 0-based position within the row tuple (A=0)
+BASE_COLS = {
+    "Agentcis ID": 0, "App ID": 1, "Student": 2,
+    "Email": 5, "COE": 10, "COE Type": 11, "Provider": 12
+}
+
+# "3 Schedule Month", "12-Schedule Commission", ... -> (schedule number, field)
+SCHEDULE_HEADER = re.compile(r"^(\d+)[-\s]*Schedule\s*(Month|Commission)", re.I)
+
+FRAMES = ["records", "installments"]
+
+
+def schedule_columns(cols):
+    """
+    {schedule_no: {"month": idx, "commission": idx}} from the header row in one
+    pass. Any number of schedules is picked up; a schedule needs both columns.
+    """
+    found = {}
+    for idx, name in enumerate(cols):
+        match = SCHEDULE_HEADER.match(str(name)) if name else None
+        if not match: continue
+        key = (int(match.group(1)), match.group(2).lower())
+        # Later headers win, but a repeated identical header keeps its first position
+        prev = found.get(key)
+        if prev is None or cols[prev] != name:
+            found[key] = idx
+
+    schedules = {}
+    for (schedule_no, field), idx in sorted(found.items()):
+        schedules.setdefault(schedule_no, {})[field] = idx
+    return {i: meta for i, meta in schedules.items() if len(meta) == 2}
+
+
+def _installment_frame(row_ids, schedules, months, commissions, extra=None):
+    columns = {"row_id": row_ids, "Schedule": schedules, "Commission": commissions}
+    if extra:
+        columns.update(extra)
+    months = pd.Categorical(months, categories=sorted(set(months)))
+    installments = pd.DataFrame(columns, index=pd.CategoricalIndex(months, name="month"))
+    # Stable sort keeps sheet order within a month
+    return installments.sort_index(kind="stable")
+
+
+def parse_tracker(file_bytes):
+    """
+    Returns (records, installments, error). records holds one row per student,
+    indexed by row id. installments is long format (row_id, Schedule,
+    Commission), indexed by a Categorical month and sorted, so looking up
+    one or more months is an index slice.
+    """
+    # read_only streams rows sequentially instead of building the whole sheet in memory
+    wb = openpyxl.load_workbook(BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        if MASTER_SHEET not in wb.sheetnames:
+            return None, None, f"Sheet '{MASTER_SHEET}' not found."
+
+        rows = wb[MASTER_SHEET].iter_rows(min_row=HEADER_ROW)
+        header = next(rows, ())
+        cols = [cell.value for cell in header]
+
+        idx_map = schedule_columns(cols)
+        row_width = max(len(cols), max(BASE_COLS.values()) + 1)
+
+        records = []
+        inst_rows, inst_schedules, inst_months, inst_commissions = [], [], [], []
+        for row in rows:
+            # Read-only rows can stop at the last stored cell, so pad them
+            values = [cell.value for cell in row]
+            values += [None] * (row_width - len(values))
+
+            # Check student name (Col C) as anchor
+            if not values[2]: continue
+
+            row_id = len(records)
+            fill = row[1].fill if len(row) > 1 else None
+            is_red = fill and fill.start_color.index == RED_FILL
+            record = {"Red Marked": "ss" if is_red else ""}
+            for label, col_idx in BASE_COLS.items():
+                record[label] = values[col_idx]
+            records.append(record)
+
+            for i, indices in idx_map.items():
+                month_val = values[indices["month"]]
+                if month_val:
+                    inst_rows.append(row_id)
+                    inst_schedules.append(i)
+                    inst_months.append(str(month_val).strip())
+                    inst_commissions.append(values[indices["commission"]])
+
+        records = pd.DataFrame(records, columns=["Red Marked", *BASE_COLS])
+        records.index.name = "row_id"
+        installments = _installment_frame(inst_rows, inst_schedules, inst_months, inst_commissions)
+        return records, installments, None
+    finally:
+        # Read-only workbooks keep the archive open until closed
+        wb.close()
+
+
+def _parse_worker(file_bytes):
+    # Runs in a pool process; exceptions come back as the error string
+    try:
+        return parse_tracker(file_bytes)
+    except Exception as e:
+        return None, None, str(e)
+
+
+def combine_trackers(parsed):
+    """
+    Merges {source: (records, installments)} into one pair. Row ids are
+    renumbered so they stay unique, and both frames get a Source column.
+    """
+    all_records = []
+    row_ids, schedules, months, commissions, sources = [], [], [], [], []
+    offset = 0
+    for source, (records, installments) in parsed.items():
+        all_records.append(records.assign(Source=source))
+        row_ids.extend(installments["row_id"] + offset)
+        schedules.extend(installments["Schedule"])
+        months.extend(installments.index.astype(str))
+        commissions.extend(installments["Commission"])
+        sources.extend([source] * len(installments))
+        offset += len(records)
+
+    if all_records:
+        records = pd.concat(all_records, ignore_index=True)
+    else:
+        records = pd.DataFrame(columns=["Red Marked", *BASE_COLS, "Source"])
+    records = records[["Source", *(c for c in records.columns if c != "Source")]]
+    records.index.name = "row_id"
+    installments = _installment_frame(
+        row_ids, schedules, months, commissions,
+        extra={"Source": pd.Categorical(sources, categories=list(parsed))}
+    )
+    return records, installments
+
+
+def load_trackers(files, max_workers=None, cache_dir=workbook_cache.CACHE_DIR):
+    """
+    Parses {source: file_bytes} into one combined (records, installments) pair
+    plus {source: error}. Cached trackers load from disk. The rest are parsed
+    in parallel worker processes, because openpyxl is CPU bound, so the total
+    time is roughly that of the largest file.
+    """
+    parsed = {}
+    errors = {}
+    misses = {}
+    for source, file_bytes in files.items():
+        digest = workbook_cache.file_digest(file_bytes, PARSER_VERSION)
+        cached = workbook_cache.load(digest, FRAMES, cache_dir)
+        if cached:
+            parsed[source] = (cached["records"], cached["installments"])
+        else:
+            misses[source] = digest
+
+    if len(misses) == 1:
+        source = next(iter(misses))
+        results = {source: _parse_worker(files[source])}
+    elif misses:
+        workers = min(len(misses), max_workers or os.cpu_count() or 1)
+        # spawn, not fork: the Streamlit server process is multi-threaded
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = {source: executor.submit(_parse_worker, files[source]) for source in misses}
+            results = {}
+            for source, future in futures.items():
+                try:
+                    results[source] = future.result()
+                except Exception as e:
+                    results[source] = (None, None, str(e))
+    else:
+        results = {}
+
+    for source, (records, installments, error) in results.items():
+        if error:
+            errors[source] = error
+            continue
+        parsed[source] = (records, installments)
+        workbook_cache.store(misses[source], {"records": records, "installments": installments}, cache_dir)
+
+    # Keep upload order regardless of which files were cached
+    parsed = {source: parsed[source] for source in files if source in parsed}
+    records, installments = combine_trackers(parsed)
+    return records, installments, errors
+
+
+def lookup_installments(records, installments, months):
+    """Installments due in any of the given months, joined with their student's details"""
+    selected = installments.loc[installments.index.isin(months)].drop(columns="Source", errors="ignore")
+    return records.join(selected.set_index("row_id"), how="inner").reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Combined commission installments due in a month across sales trackers.")
+    parser.add_argument("month", nargs="+", help="Schedule month(s) as written in the tracker, e.g. 'Mar 2025'")
+    parser.add_argument("--files", nargs="+", required=True, help="Tracker workbooks (.xlsx)")
+    parser.add_argument("-o", "--output", help="CSV file to write (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    files = {}
+    for path in args.files:
+        source = os.path.basename(path)
+        if source in files:
+            source = path
+        with open(path, "rb") as f:
+            files[source] = f.read()
+
+    records, installments, errors = load_trackers(files, max_workers=args.workers)
+    for source, error in errors.items():
+        print(f"{source}: {error}", file=sys.stderr)
+
+    due = lookup_installments(records, installments, [m.strip() for m in args.month])
+    print(f"{len(due)} installments from {len(files) - len(errors)} trackers", file=sys.stderr)
+    due.to_csv(args.output or sys.stdout, index=False)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
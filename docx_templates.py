@@ -0,0 +1,130 @@
+import concurrent.futures
+import copy
+import io
+import os
+import re
+import threading
+import zipfile
+from docx import Document
+from docx.oxml.ns import qn
+from docx.text.run import Run
+
+# {{Key}}, <Key> and [Key]
+PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}|<(\w+)>|\[(\w+)\]")
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _run_text(r):
+    return Run(r, None).text
+
+
+class CompiledTemplate:
+    """
+    A .docx template parsed once, with the run-level position of every
+    placeholder recorded up front. Rendering deep-copies the parsed document
+    and patches only the runs that hold placeholders, so the cost depends on
+    the number of placeholders, not paragraphs × keys. Run formatting is kept,
+    including for placeholders Word has split across several runs.
+    """
+
+    def __init__(self, template_path):
+        self.path = template_path
+        self.document = Document(template_path)
+        self.slots = self._compile()
+        self.keys = {key for _, matches in self.slots for key, *_ in matches}
+
+    def _paragraphs(self, document):
+        # Body paragraphs in document order, including those inside (nested) tables
+        return list(document.element.body.iter(qn('w:p')))
+
+    def _compile(self):
+        slots = []
+        for p_idx, p in enumerate(self._paragraphs(self.document)):
+            runs = p.findall(qn('w:r'))
+            texts = [_run_text(r) for r in runs]
+            full = "".join(texts)
+            if not PLACEHOLDER.search(full):
+                continue
+
+            # Run index owning each character of the paragraph text
+            owner = [i for i, text in enumerate(texts) for _ in text]
+            starts = []
+            pos = 0
+            for text in texts:
+                starts.append(pos)
+                pos += len(text)
+
+            matches = []
+            for m in PLACEHOLDER.finditer(full):
+                key = m.group(1) or m.group(2) or m.group(3)
+                start_run = owner[m.start()]
+                end_run = owner[m.end() - 1]
+                start_off = m.start() - starts[start_run]
+                end_off = m.end() - starts[end_run]
+                matches.append((key, start_run, start_off, end_run, end_off))
+            # Patched right to left so earlier offsets stay valid
+            slots.append((p_idx, matches[::-1]))
+        return slots
+
+    def render(self, data):
+        """Filled copy of the template as a BytesIO. Keys missing from data stay as written."""
+        document = copy.deepcopy(self.document)
+        paragraphs = self._paragraphs(document) if self.slots else []
+
+        for p_idx, matches in self.slots:
+            runs = [Run(r, None) for r in paragraphs[p_idx].findall(qn('w:r'))]
+            for key, start_run, start_off, end_run, end_off in matches:
+                if key not in data:
+                    continue
+                value = str(data[key])
+                if start_run == end_run:
+                    text = runs[start_run].text
+                    runs[start_run].text = text[:start_off] + value + text[end_off:]
+                    continue
+                runs[start_run].text = runs[start_run].text[:start_off] + value
+                for i in range(start_run + 1, end_run):
+                    runs[i].text = ""
+                runs[end_run].text = runs[end_run].text[end_off:]
+
+        buffer = io.BytesIO()
+        document.save(buffer)
+        buffer.seek(0)
+        return buffer
+
+
+def load(template_path):
+    """Compiled template, re-parsed only when the file on disk changes"""
+    key = os.path.abspath(template_path)
+    mtime = os.path.getmtime(key)
+    with _lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    compiled = CompiledTemplate(template_path)
+    with _lock:
+        _cache[key] = (mtime, compiled)
+    return compiled
+
+
+def fill_template(template_path, data):
+    """Replace {{Key}} / <Key> / [Key] placeholders in a docx; returns a BytesIO"""
+    return load(template_path).render(data)
+
+
+def render_zip(template_path, documents, max_workers=8):
+    """
+    Renders one template for many data dicts into a single ZIP. `documents`
+    is a list of (file name, data) pairs. The template is compiled once,
+    copies render on worker threads, and each file is written to the
+    archive as soon as it is ready. Returns the ZIP bytes.
+    """
+    template = load(template_path)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(template.render, data): file_name for file_name, data in documents}
+            for future in concurrent.futures.as_completed(futures):
+                archive.writestr(futures[future], future.result().getvalue())
+    return buffer.getvalue()
@@ -0,0 +1,99 @@
+import logging
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+# HR_API_URL points the HR pages at a local hr_service.py instead of the worker
+API_URL = os.environ.get("HR_API_URL", "https://hr-api.ashishoct34.workers.dev/api/hr")
+
+# The worker itself caches Notion for 5 minutes, so fresher than that buys nothing
+TTL = 300
+# How old a copy may get while a background refresh is pending or failing
+MAX_STALE = 24 * 60 * 60
+TIMEOUT = (5, 20)  # connect, read
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
+
+_lock = threading.Lock()
+_state = {"directory": None, "refreshing": False}
+
+
+class Directory:
+    """The /api/hr payload with employees indexed by name and employee_id"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.fetched_at = time.time()
+        self.employees = payload.get("employees", [])
+        self.by_name = {}
+        self.by_id = {}
+        for e in self.employees:
+            # First record wins, as the old linear lookup did
+            self.by_name.setdefault(e.get("name"), e)
+            if e.get("employee_id"):
+                self.by_id.setdefault(e["employee_id"], e)
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at
+
+    def names(self):
+        return sorted(e.get("name", "Unknown") for e in self.employees)
+
+
+def _fetch():
+    response = _session.get(API_URL, timeout=TIMEOUT)
+    response.raise_for_status()
+    return Directory(response.json())
+
+
+def _refresh_in_background():
+    try:
+        directory = _fetch()
+        with _lock:
+            _state["directory"] = directory
+    except Exception as e:
+        log.warning("Employee directory refresh failed (%s), keeping cached copy", e)
+    finally:
+        with _lock:
+            _state["refreshing"] = False
+
+
+def get_directory(force=False):
+    """
+    Cached employee directory shared by all sessions. Within TTL it is
+    returned as is. After that the stale copy is still returned while one
+    background thread fetches a new one (stale-while-revalidate). Only a
+    missing or very old copy blocks on the network. Raises if nothing can
+    be loaded at all.
+    """
+    with _lock:
+        directory = _state["directory"]
+        if directory and not force:
+            if directory.age < TTL:
+                return directory
+            if directory.age < MAX_STALE:
+                if not _state["refreshing"]:
+                    _state["refreshing"] = True
+                    threading.Thread(target=_refresh_in_background, daemon=True).start()
+                return directory
+
+    try:
+        directory = _fetch()
+    except Exception:
+        with _lock:
+            if _state["directory"]:
+                return _state["directory"]
+        raise
+    with _lock:
+        _state["directory"] = directory
+    return directory
+
+
+def get_employees():
+    return get_directory().employees
@@ -0,0 +1,162 @@
+import pandas as pd
+
+# Bank/cash accounts whose running balance is tracked
+BALANCE_ACCOUNTS = ['NMB', 'NBL', 'Petty Cash']
+
+
+def parse_amounts(values):
+    """Vectorised version of the '1,234.50' -> 1234.5 amount parsing"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    return pd.to_numeric(values.astype(str).str.replace(',', '', regex=False).str.strip(), errors='coerce')
+
+
+def prepare_transactions(df):
+    """Parses dates and amounts of the raw sheet and adds the MonthKey period column"""
+    df = df.copy()
+    df['Txn Date (Cash Basis)'] = pd.to_datetime(df['Txn Date (Cash Basis)'], errors='coerce')
+    df['Amount (NPR)'] = parse_amounts(df['Amount (NPR)'])
+    df['MonthKey'] = df['Txn Date (Cash Basis)'].dt.to_period('M')
+    return df
+
+
+def categorise_wise(category, description):
+    """Wise transfers grouped as Sales / IELTS / Commission, else their own category"""
+    txt = (category.astype(str) + ' ' + description.fillna('').astype(str)).str.lower()
+    wise_cat = category.where(category != 'Transfer', 'Other')
+    wise_cat = wise_cat.mask(txt.str.contains('commission', regex=False), 'Commission')
+    wise_cat = wise_cat.mask(txt.str.contains('ielts', regex=False), 'IELTS')
+    wise_cat = wise_cat.mask(txt.str.contains('sales', regex=False), 'Sales')
+    return wise_cat
+
+
+def _nested(series):
+    """{month: {key: value}} from a (MonthKey, key) indexed Series"""
+    nested = {}
+    for (month, key), value in series.items():
+        nested.setdefault(month, {})[key] = value
+    return nested
+
+
+class Ledger:
+    """
+    Month-level view of the transaction sheet. Running balances and monthly
+    breakdowns are computed once with groupby/cumsum, so looking up any month
+    is a dictionary or index read.
+    """
+
+    def __init__(self, df, accounts=BALANCE_ACCOUNTS):
+        self.accounts = list(accounts)
+        self.opening_balances = self._opening_balances(df)
+        self.balance_table = self._balance_table(df)
+
+        dated = df.dropna(subset=['MonthKey'])
+        amount = dated['Amount (NPR)']
+        category = dated['Category'] if 'Category' in dated.columns else pd.Series('', index=dated.index)
+        category = category.fillna('').replace('', 'Other')
+        description = dated['Description'] if 'Description' in dated.columns else pd.Series('', index=dated.index)
+
+        is_expense = dated['To Account'] == 'Expense'
+        is_income = dated['From Account'] == 'Income'
+        is_wise = dated['From Account'] == 'Wise'
+
+        self.expense_breakdown = _nested(
+            amount[is_expense].abs().groupby([dated.loc[is_expense, 'MonthKey'], category[is_expense]]).sum()
+        )
+        self.income_breakdown = _nested(
+            amount[is_income].groupby([dated.loc[is_income, 'MonthKey'], category[is_income]]).sum()
+        )
+        self.wise_breakdown = _nested(
+            amount[is_wise].groupby([
+                dated.loc[is_wise, 'MonthKey'],
+                categorise_wise(category[is_wise], description[is_wise])
+            ]).sum()
+        )
+
+    def _opening_balances(self, df):
+        # First non-zero opening balance listed against each account
+        opening = dict.fromkeys(self.accounts, 0)
+        if 'Opening Balance (AUD)' not in df.columns:
+            return opening
+        rows = df[df['Account Name'].isin(self.accounts)]
+        values = parse_amounts(rows['Opening Balance (AUD)'])
+        first = values[values.notna() & (values != 0)].groupby(rows['Account Name']).first()
+        opening.update(first.to_dict())
+        return opening
+
+    def _balance_table(self, df):
+        # Logic uses absolute flows: +amount into To Account, -amount out of From Account
+        dated = df.dropna(subset=['MonthKey'])
+        amount = dated['Amount (NPR)'].abs()
+        flows = pd.concat([
+            pd.DataFrame({'Account': dated['To Account'], 'MonthKey': dated['MonthKey'], 'Flow': amount}),
+            pd.DataFrame({'Account': dated['From Account'], 'MonthKey': dated['MonthKey'], 'Flow': -amount}),
+        ])
+        flows = flows[flows['Account'].isin(self.accounts)]
+
+        if dated.empty:
+            return pd.DataFrame(columns=self.accounts, dtype=float)
+
+        months = pd.period_range(dated['MonthKey'].min(), dated['MonthKey'].max(), freq='M')
+        monthly = (
+            flows.groupby(['MonthKey', 'Account'])['Flow'].sum()
+            .unstack('Account')
+            .reindex(index=months, columns=self.accounts)
+            .fillna(0)
+        )
+        return monthly.cumsum() + pd.Series(self.opening_balances)
+
+    def balances_at(self, month):
+        """Account balances at the end of the given month"""
+        table = self.balance_table
+        if table.empty or month < table.index[0]:
+            return dict(self.opening_balances)
+        if month > table.index[-1]:
+            return table.iloc[-1].to_dict()
+        return table.loc[month].to_dict()
+
+    def metrics(self, month):
+        expense_breakdown = self.expense_breakdown.get(month, {})
+        income_breakdown = self.income_breakdown.get(month, {})
+        wise_breakdown = self.wise_breakdown.get(month, {})
+        expenses = sum(expense_breakdown.values())
+        income = sum(income_breakdown.values())
+        return {
+            'expenses': expenses,
+            'income': income,
+            'wise': sum(wise_breakdown.values()),
+            'expense_breakdown': expense_breakdown,
+            'wise_breakdown': wise_breakdown,
+            'income_breakdown': income_breakdown,
+            'net_balance': income - expenses
+        }
+
+
+def pct_change(curr, prev):
+    if prev == 0: return 0
+    return ((curr - prev) / prev) * 100
+
+
+def build_month_cube(df, accounts=BALANCE_ACCOUNTS):
+    """
+    Everything the Financial page shows for a month, precomputed for every month
+    in the sheet: totals, breakdowns, closing balances, the previous month's
+    metrics and the month-over-month % deltas.
+    """
+    ledger = Ledger(df, accounts)
+    months = sorted(df['MonthKey'].dropna().unique(), reverse=True)
+
+    cube = {}
+    for month in months:
+        metrics = ledger.metrics(month)
+        prev_metrics = ledger.metrics(month - 1)
+        cube[month] = {
+            'metrics': metrics,
+            'prev_metrics': prev_metrics,
+            'balances': ledger.balances_at(month),
+            'deltas': {
+                key: pct_change(metrics[key], prev_metrics[key])
+                for key in ('expenses', 'income', 'wise')
+            }
+        }
+    return {'months': months, 'opening_balances': ledger.opening_balances, 'by_month': cube}
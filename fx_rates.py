@@ -0,0 +1,245 @@
+import argparse
+import bisect
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, timedelta
+import requests
+
+log = logging.getLogger(__name__)
+
+FX_DB = "fx_rates.db"
+NRB_API_URL = "https://www.nrb.org.np/api/forex/v1/rates"
+PER_PAGE = 100
+TIMEOUT = (5, 20)  # connect, read
+# How far back a first sync or a gap after downtime is filled in one go
+MAX_CATCH_UP_DAYS = 90
+# Wait between attempts while NRB is down or has not published today's rates
+RETRY_AFTER = 60 * 60
+
+# Used only when a currency has never been stored (same defaults as the HR dashboard)
+DEFAULT_RATES = {"NPR": 1, "AUD": 103.0, "INR": 1.6, "USD": 147.16}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rates (
+    date TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    unit INTEGER,
+    buy REAL,
+    sell REAL,
+    PRIMARY KEY (date, currency)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    synced_on TEXT
+);
+"""
+
+_lock = threading.Lock()
+# {db_path: {"dates": sorted [iso date], "table": {iso date: {currency: rate}}, "synced_on": iso date,
+#             "tried_at": ts, "syncing": True while one thread fetches from NRB}}
+_tables = {}
+
+
+def connect(db_path=FX_DB):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def fetch_nrb(start, end, session=None):
+    """
+    NRB published rates between two dates (inclusive) as rows of
+    (date, currency, unit, buy, sell). All pages are followed.
+    """
+    session = session or requests
+    rows = []
+    page = 1
+    while True:
+        response = session.get(NRB_API_URL, params={
+            "page": page, "per_page": PER_PAGE, "from": start.isoformat(), "to": end.isoformat()
+        }, timeout=TIMEOUT)
+        response.raise_for_status()
+        body = response.json()
+        data = body.get("data") or {}
+        payload = data.get("payload") or []
+        for day in payload:
+            for item in day.get("rates", []):
+                currency = (item.get("currency") or {}).get("iso3")
+                if not currency:
+                    continue
+                unit = int((item.get("currency") or {}).get("unit") or 1)
+                rows.append((day["date"], currency, unit, _float(item.get("buy")), _float(item.get("sell"))))
+        pages = (body.get("pagination") or {}).get("pages")
+        if not payload or (pages and page >= pages) or (not pages and len(payload) < PER_PAGE):
+            return rows
+        page += 1
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate(unit, buy, sell):
+    # Sell rate per single unit (INR is quoted per 100), as the worker's /api/fx does
+    price = sell or buy
+    return price / (unit or 1) if price else None
+
+
+def store_rates(rows, db_path=FX_DB):
+    if not rows:
+        return 0
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO rates VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+    finally:
+        conn.close()
+
+
+def _load_table(db_path):
+    conn = connect(db_path)
+    try:
+        table = {}
+        for day, currency, unit, buy, sell in conn.execute(
+            "SELECT date, currency, unit, buy, sell FROM rates ORDER BY date"
+        ):
+            rate = _rate(unit, buy, sell)
+            if rate:
+                table.setdefault(day, {})[currency] = rate
+        state = conn.execute("SELECT synced_on FROM sync_state WHERE id = 1").fetchone()
+    finally:
+        conn.close()
+    return {"dates": sorted(table), "table": table, "synced_on": state[0] if state else None, "tried_at": 0}
+
+
+def _mark_synced(day, db_path):
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO sync_state VALUES (1, ?)", (day.isoformat(),))
+    finally:
+        conn.close()
+
+
+def sync(today=None, db_path=FX_DB, session=None):
+    """
+    Brings the local table up to today with one NRB request covering every
+    missing day (at most MAX_CATCH_UP_DAYS). Once today's rates are stored
+    it does nothing for the rest of the day; until then it retries at most
+    every RETRY_AFTER seconds. The lock is only held to check and swap the
+    in-memory table, never during the NRB request, so lookups keep answering
+    from stored rates while it runs. Returns the number of rows stored.
+    """
+    today = today or date.today()
+    with _lock:
+        state = _tables.get(db_path) or _load_table(db_path)
+        _tables[db_path] = state
+        if (state["synced_on"] == today.isoformat() or state.get("syncing")
+                or time.time() - state["tried_at"] < RETRY_AFTER):
+            return 0
+        # Claim the sync so concurrent callers return instead of fetching too
+        state["syncing"] = True
+        start = today - timedelta(days=MAX_CATCH_UP_DAYS)
+        if state["dates"]:
+            start = max(start, date.fromisoformat(state["dates"][-1]) + timedelta(days=1))
+
+    rows = []
+    try:
+        if start <= today:
+            rows = fetch_nrb(start, today, session)
+    except Exception as e:
+        log.warning("NRB rate fetch failed (%s), using stored rates", e)
+
+    try:
+        with _lock:
+            stored = store_rates(rows, db_path)
+            state = _load_table(db_path)
+            if state["dates"] and state["dates"][-1] >= today.isoformat():
+                _mark_synced(today, db_path)
+                state["synced_on"] = today.isoformat()
+            else:
+                state["tried_at"] = time.time()
+            _tables[db_path] = state
+    finally:
+        with _lock:
+            _tables[db_path].pop("syncing", None)
+    return stored
+
+
+def backfill(start, end, db_path=FX_DB, session=None):
+    """Stores NRB rates for a past date range, e.g. before a historical payroll report"""
+    stored = store_rates(fetch_nrb(start, end, session), db_path)
+    with _lock:
+        state = _load_table(db_path)
+        state["tried_at"] = _tables.get(db_path, state)["tried_at"]
+        _tables[db_path] = state
+    return stored
+
+
+def _table(db_path):
+    with _lock:
+        state = _tables.get(db_path)
+    if state is None or (state["synced_on"] != date.today().isoformat() and not state.get("syncing")
+                         and time.time() - state["tried_at"] >= RETRY_AFTER):
+        sync(db_path=db_path)
+        with _lock:
+            state = _tables[db_path]
+    return state
+
+
+def rates(currencies, on=None, db_path=FX_DB):
+    """
+    {currency: NPR per 1 unit} for all requested currencies in one lookup.
+    Each rate is the latest published on or before `on` (default today), so
+    weekends and holidays carry the previous rate. Currencies never seen
+    locally fall back to DEFAULT_RATES, or None if there is no default.
+    """
+    state = _table(db_path)
+    key = (on or date.today()).isoformat()
+    dates = state["dates"]
+
+    requested = {c.upper().strip() for c in currencies}
+    result = {"NPR": 1} if "NPR" in requested else {}
+    pending = requested - {"NPR"}
+    # Walk back from the requested date until every currency has a rate
+    idx = bisect.bisect_right(dates, key) - 1
+    while pending and idx >= 0:
+        day_rates = state["table"][dates[idx]]
+        for currency in list(pending):
+            if currency in day_rates:
+                result[currency] = day_rates[currency]
+                pending.discard(currency)
+        idx -= 1
+    for currency in pending:
+        result[currency] = DEFAULT_RATES.get(currency)
+    return result
+
+
+def rate(currency, on=None, db_path=FX_DB):
+    return rates([currency], on, db_path)[currency.upper().strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NRB exchange rates to NPR from the local rate table.")
+    parser.add_argument("currencies", nargs="*", default=["AUD", "INR", "USD"], help="ISO codes, e.g. AUD INR")
+    parser.add_argument("--date", type=date.fromisoformat, help="Rate date (YYYY-MM-DD, default today)")
+    parser.add_argument("--backfill", type=date.fromisoformat, metavar="START",
+                        help="Store NRB rates from START up to --date first")
+    args = parser.parse_args(argv)
+
+    if args.backfill:
+        print(f"Stored {backfill(args.backfill, args.date or date.today())} rates", file=sys.stderr)
+    for currency, value in rates(args.currencies, args.date).items():
+        print(f"{currency}\t{value if value is not None else 'n/a'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import json
+import math
+from datetime import datetime, timezone
+import fx_rates
+
+# Same fallbacks the dashboard starts from (Nepal Rastra Bank rates)
+DEFAULT_FX_RATES = {"NPR": 1, "AUD": 103, "INR": 1.6}
+
+ACTIVE_STATUSES = ("Active", "Probation")
+TENURE_LABELS = ["<3m", "3m–1y", "1–2y", "2+y"]
+
+# Fields the dashboard table and employee modal use, in row order
+PEOPLE_COLUMNS = [
+    "id", "name", "department", "designation", "gender", "education", "country",
+    "joining_date", "probation_end", "dob", "status_clean", "salary_currency", "base_salary",
+    "reporting_manager", "email", "phone", "bank_account", "pan", "remarks",
+    "years_of_experience", "citizenship", "last_working_date"
+]
+
+
+def normalize_employee(e):
+    """Same shape as normalizeEmployee() in hr_analytics_dashboard.html"""
+    currency = (e.get("salary_currency") or e.get("salary_fx") or "NPR").upper().strip()
+    salary = e.get("last_salary") or e.get("base_salary") or e.get("salary_npr") or 0
+    try:
+        salary = float(salary)
+    except (TypeError, ValueError):
+        salary = 0
+    return {
+        "id": e.get("id") or e.get("employee_id") or "",
+        "name": e.get("name") or "",
+        "department": e.get("department") or "Unknown",
+        "designation": e.get("designation") or "",
+        "gender": e.get("gender") or "Unknown",
+        "education": e.get("education") or "",
+        "country": e.get("country") or "",
+        "joining_date": e.get("joining_date") or None,
+        "probation_end": e.get("probation_end") or None,
+        "dob": e.get("dob") or None,
+        "status_clean": e.get("status") or e.get("status_clean") or "Inactive",
+        "salary_currency": currency,
+        "base_salary": salary,
+        "reporting_manager": e.get("reporting_manager") or "",
+        "email": e.get("email") or "",
+        "phone": e.get("phone") or "",
+        "bank_account": e.get("bank_account") or "",
+        "pan": e.get("pan") or "",
+        "remarks": e.get("remarks") or "",
+        "years_of_experience": e.get("years_of_experience") or "",
+        "citizenship": e.get("citizenship") or "",
+        "last_working_date": e.get("last_working_date") or None
+    }
+
+
+def load_fx_rates(currencies, on=None):
+    """NPR rate per unit of each salary currency from the local NRB table"""
+    rates = dict(DEFAULT_FX_RATES)
+    rates.update({c: r for c, r in fx_rates.rates(currencies, on).items() if r})
+    return rates
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _tenure_bucket(join, now):
+    if not join:
+        return None
+    months = (now.year - join.year) * 12 + (now.month - join.month)
+    if months < 0:
+        return None
+    if months < 3: return 0
+    if months < 12: return 1
+    if months < 24: return 2
+    return 3
+
+
+def _age_group(dob, now):
+    if not dob:
+        return "Unknown"
+    age = now.year - dob.year
+    if (now.month, now.day) < (dob.month, dob.day):
+        age -= 1
+    if age < 25: return "Under 25"
+    if age < 35: return "25–34"
+    if age < 45: return "35–44"
+    if age < 55: return "45–54"
+    return "55+"
+
+
+def _count(values):
+    # First-seen order, like the dashboard's countBy
+    counts = {}
+    for v in values:
+        counts[v] = counts.get(v, 0) + 1
+    return counts
+
+
+def _compensation(active, fx_rates):
+    total = 0
+    currencies = {}
+    countries = {}
+    for e in active:
+        rate = fx_rates.get(e["salary_currency"]) or 1
+        npr = e["base_salary"] * rate
+        total += npr
+        cur = currencies.setdefault(e["salary_currency"], {"total": 0, "count": 0, "fx": rate})
+        cur["total"] += e["base_salary"]
+        cur["count"] += 1
+        country = countries.setdefault(e["country"], {"total": 0, "count": 0})
+        country["total"] += npr
+        country["count"] += 1
+    return {
+        "total": round(total, 2),
+        "avg": round(total / len(active), 2) if active else 0,
+        "currencies": {k: {**v, "total": round(v["total"], 2)} for k, v in currencies.items()},
+        # [country, employees, NPR total], highest payroll first
+        "countries": sorted(
+            ([k, v["count"], round(v["total"], 2)] for k, v in countries.items()),
+            key=lambda row: -row[2]
+        )
+    }
+
+
+def build_aggregates(raw_employees, fx_rates, now=None):
+    """
+    Everything the HR dashboard draws, computed in one place: KPIs, tenure,
+    department/gender/age breakdowns, probation alerts, filter options and
+    the compensation view for every country filter. The people table rides
+    along as compact rows so the browser has nothing left to aggregate.
+    """
+    now = now or datetime.now(timezone.utc)
+    employees = [normalize_employee(e) for e in raw_employees]
+    statuses = [e["status_clean"] for e in employees]
+
+    inactive = statuses.count("Inactive")
+    tenure = [0, 0, 0, 0]
+    probation_ending = []
+    for idx, e in enumerate(employees):
+        bucket = _tenure_bucket(_parse_date(e["joining_date"]), now)
+        if bucket is not None:
+            tenure[bucket] += 1
+        if e["status_clean"] == "Probation":
+            end = _parse_date(e["probation_end"])
+            if end:
+                days = math.ceil((end - now).total_seconds() / 86400)
+                if 0 <= days <= 30:
+                    probation_ending.append([idx, days])
+    probation_ending.sort(key=lambda row: row[1])
+
+    active = [e for e in employees if e["status_clean"] in ACTIVE_STATUSES]
+    comp_countries = sorted({e["country"] for e in employees})
+    compensation = {"": _compensation(active, fx_rates)}
+    for country in comp_countries:
+        if country:
+            compensation[country] = _compensation([e for e in active if e["country"] == country], fx_rates)
+
+    return {
+        "generated": now.isoformat(),
+        "fx": fx_rates,
+        "kpis": {
+            "total": len(employees),
+            "active": sum(s in ACTIVE_STATUSES for s in statuses),
+            "inactive": inactive,
+            "probation": statuses.count("Probation"),
+            "attrition": round(inactive / len(employees) * 100, 1) if employees else 0
+        },
+        "tenure": tenure,
+        "by_department": _count(e["department"] for e in employees),
+        "by_gender": _count(e["gender"] for e in employees),
+        "by_age": _count(_age_group(_parse_date(e["dob"]), now) for e in employees),
+        "probation_ending": probation_ending,
+        "filters": {
+            "departments": sorted({e["department"] for e in employees if e["department"]}),
+            "countries": sorted({e["country"] for e in employees if e["country"]}),
+            "comp_countries": comp_countries
+        },
+        "compensation": compensation,
+        "people": {
+            "columns": PEOPLE_COLUMNS,
+            "rows": [[e[c] for c in PEOPLE_COLUMNS] for e in employees]
+        }
+    }
+
+
+def to_json(aggregates):
+    """Compact serialisation for embedding in the page"""
+    # </ would end the inline <script> early if a name or remark contained it
+    return json.dumps(aggregates, separators=(",", ":"), ensure_ascii=False).replace("</", "<\\/")
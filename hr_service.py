@@ -0,0 +1,409 @@
+# Local stand-in for the /api/hr route of cloudflare-worker-combined.js, for
+# testing and benchmarking the HR pages offline or past Notion's 100-row page:
+#
+#   python hr_service.py --fixture sample_notion_hr.json --port 8787
+#   HR_API_URL=http://localhost:8787/api/hr streamlit run Home.py
+
+import argparse
+import concurrent.futures
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import requests
+
+log = logging.getLogger(__name__)
+
+NOTION_VERSION = "2022-06-28"
+PAGE_SIZE = 100  # Notion's maximum
+TTL = 300  # same 5 minutes the worker caches for
+FULL_RESYNC = 60 * 60  # incremental queries don't report deleted pages
+TIMEOUT = (5, 30)
+
+
+# --- Sources -------------------------------------------------------------
+
+class NotionSource:
+    """Queries a Notion database through the REST API"""
+
+    def __init__(self, token, database_id, session=None):
+        self.url = f"https://api.notion.com/v1/databases/{database_id}/query"
+        self.session = session or requests.Session()
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Notion-Version": NOTION_VERSION
+        }
+
+    def query(self, start_cursor=None, edited_since=None):
+        body = {"page_size": PAGE_SIZE}
+        if start_cursor:
+            body["start_cursor"] = start_cursor
+        if edited_since:
+            body["filter"] = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": edited_since}}
+        res = self.session.post(self.url, headers=self.headers, json=body, timeout=TIMEOUT)
+        if not res.ok:
+            raise RuntimeError(f"Notion failed with status {res.status_code}")
+        return res.json()
+
+
+class FixtureSource:
+    """
+    Serves a recorded list of Notion pages with the same pagination and
+    last_edited_time filtering as the live API. Re-reads the file when it
+    changes, so editing the fixture exercises incremental refresh.
+    """
+
+    def __init__(self, path, page_size=PAGE_SIZE, latency=0.0):
+        self.path = path
+        self.page_size = page_size
+        self.latency = latency
+        self._mtime = None
+        self._pages = []
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        if mtime != self._mtime:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._pages = data["results"] if isinstance(data, dict) else data
+            self._mtime = mtime
+        return self._pages
+
+    def query(self, start_cursor=None, edited_since=None):
+        if self.latency:
+            time.sleep(self.latency)
+        pages = self._load()
+        if edited_since:
+            pages = [p for p in pages if p.get("last_edited_time", "") >= edited_since]
+        start = int(start_cursor or 0)
+        end = start + self.page_size
+        return {
+            "object": "list",
+            "results": pages[start:end],
+            "has_more": end < len(pages),
+            "next_cursor": str(end) if end < len(pages) else None
+        }
+
+
+def load_pages(source, edited_since=None):
+    """
+    Every page of a (filtered) query, following next_cursor. Cursors are
+    sequential, so the next page is requested on a worker thread while
+    the current one is handed back, overlapping network and mapping.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(source.query, None, edited_since)
+        while future:
+            data = future.result()
+            cursor = data.get("next_cursor") if data.get("has_more") else None
+            future = executor.submit(source.query, cursor, edited_since) if cursor else None
+            yield from data.get("results", [])
+
+
+def record_fixture(source, path):
+    """Saves every page of the database, for offline runs"""
+    pages = list(load_pages(source))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"results": pages}, f, indent=1)
+    return len(pages)
+
+
+# --- Mapping (mirrors mapEmployee / normalizeStatus) ---------------------
+
+def get_text(prop): return ((prop or {}).get("rich_text") or [{}])[0].get("plain_text") or ""
+def get_select(prop): return ((prop or {}).get("select") or {}).get("name") or ""
+def get_number(prop): return (prop or {}).get("number") or 0
+def get_date(prop): return ((prop or {}).get("date") or {}).get("start") or None
+def get_formula(prop): return ((prop or {}).get("formula") or {}).get("string") or ""
+
+
+def _parse_date(value):
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def map_employee(item):
+    p = item.get("properties", {})
+    salary_fx = (get_select(p.get("Salary FX")) or "NPR").upper()
+    salary = get_number(p.get("Revised Salary (NPR)"))
+    if not isinstance(salary, (int, float)):
+        try:
+            salary = float(salary)
+        except (TypeError, ValueError):
+            salary = 0
+    return {
+        "id": get_text(p.get("Employee ID")),
+        "employee_id": get_text(p.get("Employee ID")),
+        "name": get_text(p.get("Name of employee")),
+        "designation": get_select(p.get("Designation")) or "Unknown",
+        "department": get_select(p.get("Department")) or "Unknown",
+        "country": get_select(p.get("Country")) or "Unknown",
+        "gender": get_select(p.get("Gender")) or "Unknown",
+        "education": get_select(p.get("Education/Qualification")) or "Unknown",
+        "joining_date": get_date(p.get("Joining Date")),
+        "probation_end": get_date(p.get("Probation End Date")),
+        "dob": get_date(p.get("DOB")),
+        "exit_reason": get_select(p.get("Exit Reason")),
+        "salary_currency": salary_fx,
+        "salary_fx": salary_fx,
+        "last_salary": salary,
+        "base_salary": salary,
+        "status_raw": get_formula(p.get("Status")),
+        "salary_npr": 0,
+        "reporting_manager": get_text(p.get("Reporting Manager")),
+        "email": get_text(p.get("Email")),
+        "phone": get_text(p.get("Phone")),
+        "citizenship": get_text(p.get("Citizenship")),
+        "bank_account": get_text(p.get("Bank Account")),
+        "pan": get_text(p.get("PAN")),
+        "remarks": get_text(p.get("Remarks")),
+        "years_of_experience": get_text(p.get("Years of Experience")),
+        "last_working_date": get_date(p.get("Last Working Date"))
+    }
+
+
+def normalize_status(e, now=None):
+    now = now or datetime.now(timezone.utc)
+    clean = re.sub(r"[^a-z]", "", (e.get("status_raw") or "").lower().strip())
+    e["status"] = {"active": "Active", "inactive": "Inactive", "probation": "Probation"}.get(clean, "Inactive")
+
+    if e.get("probation_end"):
+        try:
+            if _parse_date(e["probation_end"]) > now and e["status"] == "Active":
+                e["status"] = "Probation"
+        except ValueError:
+            pass
+    e["status_clean"] = e["status"]
+    return e
+
+
+# --- Aggregates (mirror countBy / groupAverage) --------------------------
+
+def count_by(items, field):
+    result = {}
+    for i in items:
+        key = i.get(field) or "Unknown"
+        result[key] = result.get(key, 0) + 1
+    return result
+
+
+def group_average(items, group_field, value_field):
+    groups = {}
+    for i in items:
+        g = i.get(group_field) or "Unknown"
+        total = groups.setdefault(g, [0.0, 0])
+        try:
+            total[0] += float(i.get(value_field) or 0)
+        except (TypeError, ValueError):
+            pass
+        total[1] += 1
+    # Math.round: halves go up
+    return {g: math.floor(s / c + 0.5) if c else 0 for g, (s, c) in groups.items()}
+
+
+def days_between(a, b):
+    return math.floor((b - a).total_seconds() / 86400)
+
+
+def build_payload(employees, now=None):
+    """The same JSON document handleHrData returns"""
+    now = now or datetime.now(timezone.utc)
+
+    def ending_soon(e):
+        if e["status"] != "Probation" or not e.get("probation_end"):
+            return False
+        try:
+            days = days_between(now, _parse_date(e["probation_end"]))
+        except ValueError:
+            return False
+        return 0 <= days <= 30
+
+    return {
+        "last_refreshed": now.isoformat().replace("+00:00", "Z"),
+        "cache_duration": "5 minutes",
+        "summary": {
+            "total_employees": len(employees),
+            "active_employees": sum(e["status"] == "Active" for e in employees),
+            "inactive_employees": sum(e["status"] == "Inactive" for e in employees),
+            "probation_next_30_days": sum(ending_soon(e) for e in employees)
+        },
+        "breakdowns": {
+            "by_department": count_by(employees, "department"),
+            "by_designation": count_by(employees, "designation"),
+            "by_gender": count_by(employees, "gender"),
+            "by_education": count_by(employees, "education")
+        },
+        "avg_salary_by_department": group_average(employees, "department", "salary_npr"),
+        "avg_salary_by_designation": group_average(employees, "designation", "salary_npr"),
+        "employees": employees
+    }
+
+
+# --- Store ---------------------------------------------------------------
+
+class HRStore:
+    """
+    In-memory copy of the database. The first load reads every page; later
+    refreshes only ask Notion for pages edited since the newest
+    last_edited_time seen and merge them in. A full resync runs every
+    FULL_RESYNC seconds to drop deleted pages. The response body is
+    serialised once per refresh and served as-is.
+    """
+
+    def __init__(self, source, ttl=TTL, full_resync=FULL_RESYNC):
+        self.source = source
+        self.ttl = ttl
+        self.full_resync = full_resync
+        self.pages = {}  # Notion page id -> mapped employee (before status)
+        self.watermark = None
+        self.loaded_at = 0
+        self.full_loaded_at = 0
+        self.payload = None
+        self.body = None
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+
+    def _merge(self, pages, full):
+        fresh = {} if full else dict(self.pages)
+        watermark = None if full else self.watermark
+        for page in pages:
+            if page.get("archived") or page.get("in_trash"):
+                fresh.pop(page["id"], None)
+            else:
+                fresh[page["id"]] = map_employee(page)
+            edited = page.get("last_edited_time")
+            if edited and (watermark is None or edited > watermark):
+                watermark = edited
+        return fresh, watermark
+
+    def refresh(self, full=False):
+        with self._refreshing:
+            full = full or not self.pages or time.time() - self.full_loaded_at > self.full_resync
+            # on_or_after re-fetches the newest page itself; cheap, and safe against clock granularity
+            pages = load_pages(self.source, None if full else self.watermark)
+            fresh, watermark = self._merge(pages, full)
+
+            now = datetime.now(timezone.utc)
+            employees = [normalize_status(dict(e), now) for e in fresh.values()]
+            payload = build_payload(employees, now)
+            body = json.dumps(payload, indent=2).encode("utf-8")
+
+            with self._lock:
+                self.pages = fresh
+                self.watermark = watermark
+                self.payload = payload
+                self.body = body
+                self.loaded_at = time.time()
+                if full:
+                    self.full_loaded_at = self.loaded_at
+            return payload
+
+    def get_body(self):
+        """(body, cache status). Stale data is served while a refresh runs in the background."""
+        with self._lock:
+            body = self.body
+            stale = time.time() - self.loaded_at > self.ttl
+        if body is None:
+            self.refresh()
+            return self.body, "MISS"
+        if stale and not self._refreshing.locked():
+            threading.Thread(target=self._refresh_quietly, daemon=True).start()
+            return body, "STALE"
+        return body, "HIT"
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            log.warning("HR refresh failed (%s), serving cached data", e)
+
+
+# --- HTTP ----------------------------------------------------------------
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Allow-Headers": "*"
+}
+
+
+def make_handler(store):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, extra=None):
+            self.send_response(status)
+            for k, v in {**CORS_HEADERS, "Content-Type": "application/json", **(extra or {})}.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_OPTIONS(self):
+            self.send_response(204)
+            for k, v in CORS_HEADERS.items():
+                self.send_header(k, v)
+            self.end_headers()
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            try:
+                if path == "/api/hr":
+                    body, cache = store.get_body()
+                    self._send(200, body, {"X-Cache": cache, "Cache-Control": "public, max-age=300"})
+                else:
+                    self._send(200, json.dumps({
+                        "message": "HR API (local)",
+                        "endpoints": {"hr_data": "/api/hr"},
+                        "version": "2.0"
+                    }, indent=2).encode("utf-8"))
+            except Exception as e:
+                self._send(500, json.dumps({"error": "Failed to load HR data", "details": str(e)}).encode("utf-8"))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(store, host="127.0.0.1", port=8787):
+    server = ThreadingHTTPServer((host, port), make_handler(store))
+    print(f"Serving HR data on http://{host}:{port}/api/hr")
+    server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HR data service (mirror of the hr-api worker).")
+    parser.add_argument("--fixture", help="Recorded Notion pages (JSON) instead of the live database")
+    parser.add_argument("--record", metavar="PATH", help="Save all live Notion pages to PATH and exit")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.fixture:
+        source = FixtureSource(args.fixture)
+    else:
+        token, database_id = os.environ.get("NOTION_TOKEN"), os.environ.get("NOTION_DB_ID")
+        if not token or not database_id:
+            parser.error("Set NOTION_TOKEN and NOTION_DB_ID, or pass --fixture")
+        source = NotionSource(token, database_id)
+
+    if args.record:
+        print(f"Recorded {record_fixture(source, args.record)} pages to {args.record}")
+        return
+
+    store = HRStore(source)
+    started = time.time()
+    payload = store.refresh(full=True)
+    print(f"Loaded {payload['summary']['total_employees']} employees in {time.time() - started:.2f}s")
+    serve(store, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
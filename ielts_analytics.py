@@ -0,0 +1,96 @@
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# Student statuses, in display order
+STATUS_REFERENCE = '🎁 Reference'
+STATUS_DROPPED = '📉 Dropped'
+STATUS_FULLY_PAID = '✅ Fully Paid'
+STATUS_PARTIAL = '⚠️ Partial Payment'
+STATUS_OUTSTANDING = '❌ Outstanding'
+
+STATUS_CATEGORIES = [STATUS_FULLY_PAID, STATUS_PARTIAL, STATUS_OUTSTANDING, STATUS_REFERENCE, STATUS_DROPPED]
+# References study free and dropped students owe nothing, so neither counts as outstanding
+NON_PAYING_STATUSES = [STATUS_DROPPED, STATUS_REFERENCE]
+
+
+def classify_students(df):
+    """
+    Status per enrolled student from the Note, balance and total_paid columns.
+    Note keywords win over payment state. Returns a Categorical Series.
+    """
+    note = df['Note'].fillna('').astype(str).str.lower() if 'Note' in df.columns else pd.Series('', index=df.index)
+    balance = df['balance'] if 'balance' in df.columns else pd.Series(0, index=df.index)
+    total_paid = df['total_paid'] if 'total_paid' in df.columns else pd.Series(0, index=df.index)
+
+    # 'ref' also covers 'reference'
+    status = np.select(
+        [
+            note.str.contains('ref', regex=False),
+            note.str.contains('dropped', regex=False),
+            balance <= 0,
+            total_paid > 0,
+        ],
+        [STATUS_REFERENCE, STATUS_DROPPED, STATUS_FULLY_PAID, STATUS_PARTIAL],
+        default=STATUS_OUTSTANDING
+    )
+    return pd.Series(pd.Categorical(status, categories=STATUS_CATEGORIES), index=df.index, name='status')
+
+
+def office_breakdown(df_students, df_payments):
+    """
+    Per-office student counts and revenue in a single groupby. Students come
+    from enrollments (status/balance already set), revenue from the payments
+    of the selected period. Used by both the dashboard table and the email.
+    """
+    status = df_students['status']
+    flags = pd.DataFrame({
+        'Office': df_students['Office'],
+        'Name': df_students['Name'],
+        'fully_paid': status == STATUS_FULLY_PAID,
+        'outstanding': ~status.isin(NON_PAYING_STATUSES) & (df_students['balance'] > 0),
+        'reference': status == STATUS_REFERENCE,
+        'dropped': status == STATUS_DROPPED,
+    })
+
+    breakdown = flags.groupby('Office').agg(**{
+        'Total Students': ('Name', 'count'),
+        'Fully Paid': ('fully_paid', 'sum'),
+        'Outstanding': ('outstanding', 'sum'),
+        'References': ('reference', 'sum'),
+        'Dropped': ('dropped', 'sum'),
+    }).reset_index()
+
+    office_revenue = df_payments.groupby('Office')['Paid Amount'].sum()
+    breakdown['Revenue'] = breakdown['Office'].map(office_revenue).fillna(0).astype(int)
+    return breakdown
+
+
+def normalise_name(name):
+    """Join key for a student name: accents folded, case folded, single-spaced"""
+    if not isinstance(name, str):
+        return ''
+    decomposed = unicodedata.normalize('NFKD', name)
+    # Drop Latin combining accents only; Devanagari vowel signs are part of the name
+    folded = ''.join(c for c in decomposed if not '\u0300' <= c <= '\u036f')
+    return ' '.join(folded.casefold().split())
+
+
+def student_ids(*name_columns):
+    """
+    Stable integer student ids for several name columns at once, e.g. the
+    enrollment and payment sheets. Names normalising to the same key share an
+    id; blank names get -1 so they never join. Each distinct raw name is
+    normalised once. Returns one int array per column.
+    """
+    raw = pd.concat([pd.Series(col, dtype=object) for col in name_columns], ignore_index=True)
+    keys = {name: normalise_name(name) for name in raw.dropna().unique()}
+    normalised = raw.map(keys).fillna('')
+    codes, _ = pd.factorize(normalised.where(normalised != ''))
+
+    ids = []
+    offset = 0
+    for col in name_columns:
+        ids.append(codes[offset:offset + len(col)])
+        offset += len(col)
+    return ids
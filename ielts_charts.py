@@ -0,0 +1,84 @@
+import base64
+import concurrent.futures
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+
+MAX_CACHED = 32
+
+# Figures are created with Figure() rather than pyplot, so nothing is kept in
+# pyplot's figure registry and a figure is freed as soon as its PNG is taken
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='ielts-chart')
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _to_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    fig.clear()
+    return buffer.getvalue()
+
+
+def status_pie_png(labels, values):
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=90)
+    ax.axis('equal')
+    return _to_png(fig)
+
+
+def revenue_bar_png(labels, values, colors=('#3498db', '#e74c3c')):
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    ax.bar(labels, values, color=list(colors)[:len(labels)], width=0.5)
+    ax.set_ylabel('Revenue (NPR)')
+    ax.set_xlabel('')
+    ax.tick_params(axis='x', labelrotation=0)
+    return _to_png(fig)
+
+
+def _key(*parts):
+    return hashlib.sha1(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+
+
+def render_charts(status_counts, revenue, period):
+    """
+    PNG bytes for the dashboard charts, keyed by the data and the selected
+    period. Both charts render together on worker threads the first time and
+    later reruns reuse the bytes. The same bytes go to st.image and to the
+    email. Returns {'status': bytes or None, 'revenue': bytes}.
+    """
+    status_labels = [str(label) for label in status_counts.index]
+    status_values = [int(value) for value in status_counts.values]
+    revenue_labels = list(revenue.keys())
+    revenue_values = [float(value) for value in revenue.values()]
+    key = _key(status_labels, status_values, revenue_labels, revenue_values, period)
+
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    status_future = _executor.submit(status_pie_png, status_labels, status_values) if status_values else None
+    revenue_future = _executor.submit(revenue_bar_png, revenue_labels, revenue_values)
+    charts = {
+        'status': status_future.result() if status_future else None,
+        'revenue': revenue_future.result()
+    }
+
+    with _lock:
+        _cache[key] = charts
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+    return charts
+
+
+def data_uri(png):
+    """Inline form of a chart for HTML previews"""
+    return "data:image/png;base64," + base64.b64encode(png).decode('ascii')
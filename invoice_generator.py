@@ -1,6 +1,17 @@
+import concurrent.futures
+import copy
+import csv
+import io
+import math
 import os
+import re
+import threading
+import zipfile
 from docx import Document
 
+_cache = {}
+_lock = threading.Lock()
+
 def _clear_paragraph(p):
     """Helper to clear text from a paragraph without losing its formatting"""
     if len(p.runs) > 0:
@@ -15,7 +26,7 @@ def _replace_paragraph_text(p, text):
     else:
         p.add_run(text)
 
-def generate_invoice(supplier, invoice_date, invoice_no, period_str, amount, output_path):
+def _template_path():
     # Absolute path logic to find the template if executed from root or within pages
     base_dir = os.path.dirname(os.path.abspath(__file__))
     template_path = os.path.join(base_dir, "templates", "rcti_template.docx")
@@ -25,8 +36,35 @@ def generate_invoice(supplier, invoice_date, invoice_no, period_str, amount, out
         template_path = os.path.join(os.getcwd(), "templates", "rcti_template.docx")
         if not os.path.exists(template_path):
              raise FileNotFoundError(f"Template not found at {template_path}")
+    return template_path
 
+def load_template():
+    """Parsed RCTI template, re-read only when the file on disk changes"""
+    template_path = _template_path()
+    mtime = os.path.getmtime(template_path)
+    with _lock:
+        cached = _cache.get(template_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
     doc = Document(template_path)
+    with _lock:
+        _cache[template_path] = (mtime, doc)
+    return doc
+
+def _file_safe(text):
+    """Text usable in a file or ZIP member name: no path separators or characters Windows rejects"""
+    return re.sub(r'[<>:"/\\|?*\x00-\x1f]', "-", str(text)).strip(" .") or "Unknown"
+
+def invoice_filename(invoice_no, supplier):
+    return f"RCTI_SC_{_file_safe(invoice_no)}_{_file_safe(supplier['name']).replace(' ', '_')}.docx"
+
+def generate_invoice(supplier, invoice_date, invoice_no, period_str, amount, output_path=None):
+    """
+    Renders one RCTI and returns the .docx bytes. Each invoice is a deep copy
+    of the template parsed once by load_template, so nothing is read from or
+    written to disk unless output_path is given.
+    """
+    doc = copy.deepcopy(load_template())
     
     # We mapped these paragraph indexes previously
     # Paragraph 6: Date: 24 Oct 2025
@@ -74,8 +112,85 @@ def generate_invoice(supplier, invoice_date, invoice_no, period_str, amount, out
     # Table 0 Row 2 Col 1: Total amount
     _replace_paragraph_text(table.cell(2, 1).paragraphs[0], amount_str)
 
-    doc.save(output_path)
-    return output_path
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    data = buffer.getvalue()
+    if output_path:
+        with open(output_path, "wb") as f:
+            f.write(data)
+    return data
+
+SUMMARY_COLUMNS = ["Invoice No", "Supplier ID", "Supplier", "ABN", "Amount", "Period", "Invoice Date", "File", "Status"]
+
+def generate_batch(suppliers, lines, invoice_date, period_str, start_no, max_workers=8):
+    """
+    Renders one RCTI per (supplier id, amount) line into a single ZIP.
+    Invoice numbers are handed out in line order from start_no before any
+    rendering starts, so they are consecutive and never depend on which
+    worker finishes first. Lines with an unknown supplier or no finite, positive
+    amount are skipped without using a number. Returns (zip bytes, summary
+    rows); the summary is also written into the ZIP as summary.csv.
+    """
+    by_id = {str(s['id']): s for s in suppliers}
+    summary = []
+    jobs = []
+    used_names = set()
+    next_no = int(start_no)
+    for supplier_id, amount in lines:
+        supplier_id = str(supplier_id).strip()
+        supplier = by_id.get(supplier_id)
+        row = {"Invoice No": "", "Supplier ID": supplier_id, "Supplier": supplier['name'] if supplier else "",
+               "ABN": supplier['abn'] if supplier else "", "Amount": None, "Period": period_str,
+               "Invoice Date": invoice_date, "File": "", "Status": "Generated"}
+        try:
+            amount = float(amount)
+        except (TypeError, ValueError):
+            amount = None
+        # A blank cell in an uploaded CSV arrives as NaN
+        if amount is not None and not math.isfinite(amount):
+            amount = None
+        row["Amount"] = amount
+        if not supplier:
+            row["Status"] = "Skipped: unknown supplier"
+        elif amount is None:
+            row["Status"] = "Skipped: amount missing or not a number"
+        elif amount <= 0:
+            row["Status"] = "Skipped: amount must be greater than 0"
+        else:
+            # Invoice numbers already keep names apart; the counter is a guard for the archive
+            file_name = invoice_filename(next_no, supplier)
+            counter = 2
+            while file_name in used_names:
+                file_name = invoice_filename(next_no, supplier).replace(".docx", f"_{counter}.docx")
+                counter += 1
+            used_names.add(file_name)
+            row.update({"Invoice No": f"RCTI_SC_{next_no}", "File": file_name})
+            jobs.append((row, supplier, str(next_no), amount))
+            next_no += 1
+        summary.append(row)
+
+    # Parse the template once up front rather than in every worker
+    load_template()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(generate_invoice, supplier, invoice_date, invoice_no, period_str, amount): row
+                for row, supplier, invoice_no, amount in jobs
+            }
+            for future in concurrent.futures.as_completed(futures):
+                row = futures[future]
+                try:
+                    archive.writestr(row["File"], future.result())
+                except Exception as e:
+                    row["Status"] = f"Failed: {e}"
+
+        summary_csv = io.StringIO()
+        writer = csv.DictWriter(summary_csv, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(summary)
+        archive.writestr("summary.csv", summary_csv.getvalue())
+    return buffer.getvalue(), summary
 
 if __name__ == "__main__":
     # Test
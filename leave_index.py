@@ -0,0 +1,138 @@
+import sqlite3
+import pandas as pd
+
+LEAVE_INDEX_DB = "leave_index.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leaves (
+    account TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    message_id TEXT,
+    thread_id TEXT,
+    sender TEXT,
+    signature_name TEXT,
+    name TEXT,
+    status TEXT,
+    subject TEXT,
+    date TEXT,
+    link TEXT,
+    PRIMARY KEY (account, uid)
+);
+CREATE INDEX IF NOT EXISTS leaves_by_date ON leaves (account, date);
+CREATE INDEX IF NOT EXISTS leaves_by_name ON leaves (account, name);
+CREATE TABLE IF NOT EXISTS scan_state (
+    account TEXT PRIMARY KEY,
+    mailbox TEXT,
+    uidvalidity INTEGER,
+    keywords TEXT,
+    start TEXT,
+    end TEXT,
+    last_uid INTEGER
+);
+"""
+
+COLUMNS = ["uid", "message_id", "thread_id", "sender", "signature_name", "name", "status", "subject", "date", "link"]
+
+
+def connect(db_path=LEAVE_INDEX_DB):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_scan_state(account, db_path=LEAVE_INDEX_DB):
+    conn = connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT mailbox, uidvalidity, keywords, start, end, last_uid FROM scan_state WHERE account = ?",
+            (account,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return {}
+    return {
+        "mailbox": row[0],
+        "uidvalidity": row[1],
+        "keywords": row[2].split("\n") if row[2] else [],
+        "start": row[3],
+        "end": row[4],
+        "last_uid": row[5] or 0
+    }
+
+
+def save_scan_state(account, state, db_path=LEAVE_INDEX_DB):
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO scan_state VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (account, state["mailbox"], state["uidvalidity"], "\n".join(state["keywords"]),
+                 state["start"], state["end"], state["last_uid"])
+            )
+    finally:
+        conn.close()
+
+
+def reset_account(account, db_path=LEAVE_INDEX_DB):
+    """Drops stored leaves, e.g. after UIDVALIDITY changes and old UIDs stop meaning anything"""
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM leaves WHERE account = ?", (account,))
+            conn.execute("DELETE FROM scan_state WHERE account = ?", (account,))
+    finally:
+        conn.close()
+
+
+def known_uids(account, db_path=LEAVE_INDEX_DB):
+    conn = connect(db_path)
+    try:
+        return {r[0] for r in conn.execute("SELECT uid FROM leaves WHERE account = ?", (account,))}
+    finally:
+        conn.close()
+
+
+def upsert_leaves(account, records, db_path=LEAVE_INDEX_DB):
+    if not records:
+        return 0
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO leaves (account, {', '.join(COLUMNS)}) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+                [(account, *(r[c] for c in COLUMNS)) for r in records]
+            )
+        return len(records)
+    finally:
+        conn.close()
+
+
+def query_leaves(account, start_date, end_date, keyword=None, staff=None, db_path=LEAVE_INDEX_DB):
+    """
+    Stored leave records for an account, newest first. Dates are inclusive;
+    keyword matches the subject and staff matches the display name.
+    """
+    sql = f"SELECT {', '.join(COLUMNS)} FROM leaves WHERE account = ? AND date BETWEEN ? AND ?"
+    params = [account, start_date.isoformat(), end_date.isoformat()]
+    if keyword:
+        sql += " AND subject LIKE ?"
+        params.append(f"%{keyword}%")
+    if staff:
+        sql += " AND name = ?"
+        params.append(staff)
+    sql += " ORDER BY date DESC, uid DESC"
+
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def staff_names(account, db_path=LEAVE_INDEX_DB):
+    conn = connect(db_path)
+    try:
+        return [r[0] for r in conn.execute("SELECT DISTINCT name FROM leaves WHERE account = ? ORDER BY name", (account,))]
+    finally:
+        conn.close()
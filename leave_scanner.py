@@ -0,0 +1,356 @@
+import imaplib
+import email
+import email.utils
+import logging
+import re
+import concurrent.futures
+from datetime import date, timedelta
+from email.header import decode_header, make_header
+import leave_index
+
+log = logging.getLogger(__name__)
+
+FETCH_BATCH_SIZE = 100
+# Gmail allows 15 simultaneous IMAP connections per account; the page already holds one
+GMAIL_MAX_CONNECTIONS = 15
+DEFAULT_WORKERS = 4
+PARALLEL_MIN_UIDS = 2 * FETCH_BATCH_SIZE
+HEADER_FIELDS = "BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE MESSAGE-ID)]"
+
+
+# --- PARSING HELPERS ---
+
+def extract_name_from_signature(body):
+    patterns = [
+        r"(?:Best regards|Regards|Thanks|Cheers|Sincerely)[,\s]*\n\s*([A-Z][a-z]+ [A-Z][a-z]+)",
+        r"(?:Best regards|Regards|Thanks|Cheers|Sincerely)[,\s]*\n\s*([A-Z][a-z]+)"
+    ]
+    for p in patterns:
+        match = re.search(p, body, re.IGNORECASE | re.MULTILINE)
+        if match:
+            return match.group(1).strip()
+    return None
+
+def connect_to_gmail(username, password):
+    try:
+        mail = imaplib.IMAP4_SSL("imap.gmail.com")
+        mail.login(username, password)
+        return mail
+    except Exception as e:
+        return str(e)
+
+def extract_leave_details(subject, body):
+    subject_lower = subject.lower()
+    body_lower = body.lower()
+
+    status = "Unknown"
+    if "sick" in subject_lower or "sick" in body_lower:
+        status = "Sick Leave"
+    elif "half" in subject_lower:
+        status = "Half Day"
+    elif "vacation" in subject_lower or "holiday" in subject_lower:
+        status = "Vacation"
+    elif "wfh" in subject_lower or "working from home" in subject_lower:
+        status = "WFH"
+    elif "early" in subject_lower or "departure" in subject_lower:
+        status = "Early Leave"
+    elif "application" in subject_lower or "request" in subject_lower:
+        status = "Leave Request"
+    return status
+
+def get_email_content(msg):
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            content_disposition = str(part.get("Content-Disposition"))
+            if content_type == "text/plain" and "attachment" not in content_disposition:
+                return part.get_payload(decode=True).decode(errors="replace")
+    else:
+        return msg.get_payload(decode=True).decode(errors="replace")
+    return ""
+
+def parse_keywords(search_query):
+    """Turns the 'Leave OR Sick OR ...' box into a keyword list"""
+    clean_query = search_query.replace("subject:(", "").replace(")", "").replace('"', "")
+    return [k.strip() for k in clean_query.split("OR") if k.strip()]
+
+def decode_subject(raw_subject):
+    if not raw_subject:
+        return ""
+    try:
+        return str(make_header(decode_header(raw_subject)))
+    except Exception:
+        return raw_subject
+
+def build_link(thread_id, message_id):
+    if thread_id:
+        try:
+            return f"https://mail.google.com/mail/u/0/#inbox/{hex(int(thread_id))[2:]}"
+        except ValueError:
+            pass
+    clean_msg_id = "".join((message_id or "").split()).replace("<", "").replace(">", "")
+    return f"https://mail.google.com/mail/u/0/#search/rfc822msgid%3A{clean_msg_id}"
+
+
+# --- IMAP SEARCH & FETCH ---
+
+def _gmail_raw_query(keywords, start_date, end_date):
+    terms = " OR ".join(f'\\"{k}\\"' if " " in k else k for k in keywords)
+    # Gmail's before: is exclusive, so push it one day past the end date
+    before = end_date + timedelta(days=1)
+    return f'"subject:({terms}) after:{start_date.strftime("%Y/%m/%d")} before:{before.strftime("%Y/%m/%d")}"'
+
+def _imap_criteria(keywords, start_date, end_date):
+    subject = None
+    for k in keywords:
+        term = f'SUBJECT "{k}"'
+        subject = term if subject is None else f"(OR {subject} {term})"
+    before = end_date + timedelta(days=1)
+    criteria = [f"SINCE {start_date.strftime('%d-%b-%Y')}", f"BEFORE {before.strftime('%d-%b-%Y')}"]
+    if subject:
+        criteria.append(subject)
+    return criteria
+
+def search_uids(mail, keywords, start_date, end_date, min_uid=None):
+    """
+    Server-side search limited to the subject keywords and date range.
+    Uses Gmail's X-GM-RAW when available, plain IMAP SUBJECT/SINCE otherwise.
+    """
+    uid_range = ["UID", f"{min_uid}:*"] if min_uid else []
+    try:
+        typ, data = mail.uid("SEARCH", *uid_range, "X-GM-RAW", _gmail_raw_query(keywords, start_date, end_date))
+        if typ != "OK":
+            raise imaplib.IMAP4.error(typ)
+    except imaplib.IMAP4.error:
+        typ, data = mail.uid("SEARCH", *uid_range, *_imap_criteria(keywords, start_date, end_date))
+        if typ != "OK":
+            return []
+    uids = [int(u) for u in data[0].split()]
+    # "n:*" always matches the newest message, even when it is below n
+    if min_uid:
+        uids = [u for u in uids if u >= min_uid]
+    return sorted(uids)
+
+def _parse_fetch(data):
+    """Maps UID -> (metadata line, payload bytes) from a UID FETCH response"""
+    results = {}
+    for part in data:
+        if not isinstance(part, tuple):
+            continue
+        meta = part[0].decode(errors="replace")
+        uid_match = re.search(r"UID\s+(\d+)", meta)
+        if uid_match:
+            results[int(uid_match.group(1))] = (meta, part[1])
+    return results
+
+def _sent_date(date_header, meta):
+    """Date header as a date, falling back to the server's INTERNALDATE"""
+    try:
+        return email.utils.parsedate_to_datetime(date_header).date()
+    except (TypeError, ValueError):
+        pass
+    internal = imaplib.Internaldate2tuple(meta.encode())
+    return date(*internal[:3]) if internal else None
+
+def fetch_headers(mail, uids, batch_size=FETCH_BATCH_SIZE):
+    """
+    Header-only prefetch, many UIDs per round trip. Raises if a batch fails,
+    so a scan never moves its watermark past emails it did not see.
+    """
+    headers = {}
+    for i in range(0, len(uids), batch_size):
+        batch = ",".join(str(u) for u in uids[i:i + batch_size])
+        try:
+            typ, data = mail.uid("FETCH", batch, f"(UID INTERNALDATE X-GM-THRID {HEADER_FIELDS})")
+        except imaplib.IMAP4.error:
+            # Not a Gmail server, so no thread ids
+            typ, data = mail.uid("FETCH", batch, f"(UID INTERNALDATE {HEADER_FIELDS})")
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"Header FETCH failed for UIDs {batch}: {data}")
+        for uid, (meta, raw) in _parse_fetch(data).items():
+            msg = email.message_from_bytes(raw)
+            thrid_match = re.search(r"X-GM-THRID\s+(\d+)", meta)
+            headers[uid] = {
+                "subject": decode_subject(msg.get("Subject")),
+                "from": msg.get("From", ""),
+                "date": msg.get("Date"),
+                "sent": _sent_date(msg.get("Date"), meta),
+                "message_id": msg.get("Message-ID", "").strip(),
+                "thread_id": thrid_match.group(1) if thrid_match else None
+            }
+    return headers
+
+def fetch_bodies(mail, uids, batch_size=FETCH_BATCH_SIZE):
+    """Full messages for the given UIDs without marking them as read"""
+    bodies = {}
+    for i in range(0, len(uids), batch_size):
+        batch = ",".join(str(u) for u in uids[i:i + batch_size])
+        typ, data = mail.uid("FETCH", batch, "(UID BODY.PEEK[])")
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"Body FETCH failed for UIDs {batch}: {data}")
+        for uid, (_, raw) in _parse_fetch(data).items():
+            bodies[uid] = email.message_from_bytes(raw)
+    return bodies
+
+def build_leave_record(uid, header, msg):
+    """Parsed leave row in the shape stored by leave_index"""
+    sender_name = header["from"].split("<")[0].replace('"', '').strip()
+    body = get_email_content(msg) or ""
+    signature_name = extract_name_from_signature(body)
+    return {
+        "uid": uid,
+        "message_id": header["message_id"],
+        "thread_id": header["thread_id"],
+        "sender": sender_name,
+        "signature_name": signature_name,
+        "name": signature_name if signature_name else sender_name,
+        "status": extract_leave_details(header["subject"], body),
+        "subject": header["subject"],
+        "date": header["sent"].isoformat(),
+        "link": build_link(header["thread_id"], header["message_id"])
+    }
+
+def scan_uids(mail, uids, keywords, start_date, end_date, progress_callback=None):
+    """
+    Header prefetch for the UIDs, then bodies only for subject/date matches.
+    Returns (records, missed): missed lists UIDs that could not be checked,
+    e.g. absent from the FETCH response or with no usable date.
+    """
+    if progress_callback: progress_callback(f"Fetching headers for {len(uids)} emails...")
+    headers = fetch_headers(mail, uids)
+    missed = [uid for uid in uids if uid not in headers]
+
+    matches = []
+    for uid, header in headers.items():
+        subject_lower = header["subject"].lower()
+        if not any(k.lower() in subject_lower for k in keywords):
+            continue
+        if header["sent"] is None:
+            missed.append(uid)
+        elif start_date <= header["sent"] <= end_date:
+            matches.append(uid)
+
+    if progress_callback: progress_callback(f"Downloading {len(matches)} matching emails...")
+    bodies = fetch_bodies(mail, sorted(matches))
+    missed.extend(uid for uid in matches if uid not in bodies)
+    return [build_leave_record(uid, headers[uid], msg) for uid, msg in bodies.items()], missed
+
+def _split_uids(uids, parts):
+    """Contiguous UID ranges of roughly equal size, one per worker"""
+    size = -(-len(uids) // parts)
+    return [uids[i:i + size] for i in range(0, len(uids), size)]
+
+def _scan_worker(connect, mailbox, uids, keywords, start_date, end_date):
+    mail = connect()
+    if isinstance(mail, str):
+        raise imaplib.IMAP4.error(mail)
+    try:
+        mail.select(mailbox, readonly=True)
+        return scan_uids(mail, uids, keywords, start_date, end_date)
+    finally:
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+def scan_uids_parallel(mail, connect, mailbox, uids, keywords, start_date, end_date,
+                       workers=DEFAULT_WORKERS, progress_callback=None):
+    """
+    Splits the UIDs into ranges and scans each over its own IMAP connection.
+    Ranges whose worker fails (login refused, connection limit hit) are
+    retried serially over the caller's connection.
+    """
+    workers = max(1, min(workers, GMAIL_MAX_CONNECTIONS - 1, -(-len(uids) // FETCH_BATCH_SIZE)))
+    if workers == 1 or connect is None:
+        return scan_uids(mail, uids, keywords, start_date, end_date, progress_callback)
+
+    chunks = _split_uids(uids, workers)
+    records = []
+    missed = []
+    failed = []
+    if progress_callback: progress_callback(f"Scanning {len(uids)} emails over {len(chunks)} connections...")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+        future_to_chunk = {
+            executor.submit(_scan_worker, connect, mailbox, chunk, keywords, start_date, end_date): chunk
+            for chunk in chunks
+        }
+        done = 0
+        for future in concurrent.futures.as_completed(future_to_chunk):
+            done += 1
+            try:
+                chunk_records, chunk_missed = future.result()
+                records.extend(chunk_records)
+                missed.extend(chunk_missed)
+            except Exception as e:
+                log.warning("IMAP worker failed, retrying its range serially: %s", e)
+                failed.extend(future_to_chunk[future])
+            # Progress only from this thread; Streamlit widgets can't be touched from workers
+            if progress_callback: progress_callback(f"Scanned {done}/{len(chunks)} ranges...")
+
+    if failed:
+        retry_records, retry_missed = scan_uids(mail, sorted(failed), keywords, start_date, end_date, progress_callback)
+        records.extend(retry_records)
+        missed.extend(retry_missed)
+    return records, missed
+
+def scan_leave_emails(mail, account, search_query, start_date, end_date,
+                      mailbox="inbox", db_path=leave_index.LEAVE_INDEX_DB, connect=None,
+                      workers=DEFAULT_WORKERS, progress_callback=None):
+    """
+    Incremental leave scan into the local leave index. A date range that is
+    already covered only searches UIDs above the stored watermark; a wider
+    range is searched in full once. Large back-fills are spread over several
+    connections opened with `connect` when it is given.
+    Returns the number of newly indexed emails.
+    """
+    keywords = parse_keywords(search_query)
+    typ, _ = mail.select(mailbox, readonly=True)
+    if typ != "OK":
+        raise imaplib.IMAP4.error(f"Could not open mailbox {mailbox}")
+    uidvalidity = int(mail.untagged_responses.get("UIDVALIDITY", [b"0"])[0])
+
+    state = leave_index.get_scan_state(account, db_path)
+    if (state.get("mailbox"), state.get("uidvalidity")) != (mailbox, uidvalidity):
+        # Stored UIDs mean nothing once the mailbox or its UIDVALIDITY changes
+        leave_index.reset_account(account, db_path)
+        state = {}
+    if not state or state["keywords"] != keywords:
+        state = {
+            "mailbox": mailbox,
+            "uidvalidity": uidvalidity,
+            "keywords": keywords,
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "last_uid": 0
+        }
+
+    covered = state["last_uid"] and state["start"] <= start_date.isoformat() and state["end"] >= end_date.isoformat()
+    state["start"] = min(state["start"], start_date.isoformat())
+    state["end"] = max(state["end"], end_date.isoformat())
+    search_start, search_end = date.fromisoformat(state["start"]), date.fromisoformat(state["end"])
+
+    if progress_callback: progress_callback("Searching mailbox...")
+    min_uid = state["last_uid"] + 1 if covered else None
+    uids = search_uids(mail, keywords, search_start, search_end, min_uid=min_uid)
+
+    known = leave_index.known_uids(account, db_path)
+    new_uids = [u for u in uids if u not in known]
+    added = 0
+    missed = []
+    if new_uids:
+        if connect is not None and len(new_uids) >= PARALLEL_MIN_UIDS:
+            records, missed = scan_uids_parallel(mail, connect, mailbox, new_uids, keywords, search_start, search_end,
+                                                 workers=workers, progress_callback=progress_callback)
+        else:
+            records, missed = scan_uids(mail, new_uids, keywords, search_start, search_end, progress_callback)
+        added = leave_index.upsert_leaves(account, records, db_path)
+    # The watermark stops below the first email that could not be checked,
+    # so the next incremental search picks it up again. After a widened range
+    # that can mean moving it down; indexed UIDs above it are skipped via known_uids.
+    if uids:
+        state["last_uid"] = max(state["last_uid"], max(uids))
+    if missed:
+        state["last_uid"] = min(state["last_uid"], min(missed) - 1)
+    leave_index.save_scan_state(account, state, db_path)
+    return added
@@ -1,8 +1,9 @@
 import streamlit as st
+import pandas as pd
 import json
 import os
 import uuid
-from invoice_generator import generate_invoice
+from invoice_generator import generate_invoice, generate_batch, invoice_filename
 from datetime import datetime
 
 SUPPLIERS_FILE = 'suppliers.json'
@@ -26,7 +27,7 @@ suppliers = load_suppliers()
 st.sidebar.header("Supplier Management")
 
 # Management Mode
-mgr_mode = st.sidebar.radio("Action", ["Select Supplier", "Add New Supplier", "Edit Supplier", "Delete Supplier"])
+mgr_mode = st.sidebar.radio("Action", ["Select Supplier", "Bulk Fortnightly Run", "Add New Supplier", "Edit Supplier", "Delete Supplier"])
 
 supplier_options = {s['id']: f"{s['name']} (ABN: {s['abn']})" for s in suppliers}
 
@@ -146,19 +147,14 @@ if mgr_mode == "Select Supplier":
                 st.error("Please enter a valid amount greater than 0.")
             else:
                 try:
-                    filename = f"RCTI_SC_{inv_no_input}_{supplier['name'].replace(' ', '_')}.docx"
-                    output_path = os.path.join(os.getcwd(), filename)
-                    generate_invoice(
+                    filename = invoice_filename(inv_no_input, supplier)
+                    file_data = generate_invoice(
                         supplier=supplier,
                         invoice_date=inv_date_str,
                         invoice_no=inv_no_input,
                         period_str=period_str,
-                        amount=amount,
-                        output_path=output_path
+                        amount=amount
                     )
-                    
-                    with open(output_path, "rb") as f:
-                        file_data = f.read()
                         
                     st.success("Invoice generated successfully!")
                     st.download_button(
@@ -169,3 +165,82 @@ if mgr_mode == "Select Supplier":
                     )
                 except Exception as e:
                     st.error(f"Error generating invoice: {e}")
+
+# Bulk run: one invoice per supplier line for the same fortnight
+elif mgr_mode == "Bulk Fortnightly Run":
+    if not suppliers:
+        st.info("Please add suppliers from the sidebar before running a bulk batch.")
+    else:
+        st.subheader("Bulk Fortnightly Run")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            bulk_date = st.date_input("Invoice Date", value="today", key="bulk_date")
+            bulk_date_str = bulk_date.strftime("%d %b %Y")
+        with col2:
+            start_no_input = st.text_input("Starting Invoice No", placeholder="e.g., 27", key="bulk_start_no")
+            if start_no_input and not start_no_input.isdigit():
+                st.warning("Invoice No should be numbers only.")
+
+        col3, col4 = st.columns(2)
+        with col3:
+            bulk_start = st.date_input("Fortnight Start Date", value="today", key="bulk_start")
+        with col4:
+            bulk_end = st.date_input("Fortnight End Date", value="today", key="bulk_end")
+        bulk_period_str = f"{bulk_start.strftime('%d %b %Y')} to {bulk_end.strftime('%d %b %Y')}"
+
+        st.markdown("**Amounts:** upload a CSV with `supplier_id` and `amount` columns, or fill in the table below.")
+        uploaded = st.file_uploader("Amounts CSV", type=["csv"])
+        if uploaded:
+            lines_df = pd.read_csv(uploaded, dtype={"supplier_id": str})
+            lines_df.columns = [c.strip().lower().replace(" ", "_") for c in lines_df.columns]
+            if not {"supplier_id", "amount"}.issubset(lines_df.columns):
+                st.error("The CSV needs 'supplier_id' and 'amount' columns.")
+                lines_df = None
+        else:
+            lines_df = st.data_editor(
+                pd.DataFrame({
+                    "supplier_id": [s['id'] for s in suppliers],
+                    "supplier": [s['name'] for s in suppliers],
+                    "amount": [0.0] * len(suppliers)
+                }),
+                disabled=["supplier_id", "supplier"],
+                hide_index=True,
+                use_container_width=True,
+                key="bulk_amounts"
+            )
+
+        if st.button("Generate All Invoices", type="primary"):
+            if not start_no_input.isdigit():
+                st.error("Please enter a valid numeric starting Invoice Number.")
+            elif lines_df is None or lines_df.empty:
+                st.error("No supplier amounts to invoice.")
+            else:
+                with st.spinner("Generating invoices..."):
+                    zip_bytes, summary = generate_batch(
+                        suppliers,
+                        lines_df[["supplier_id", "amount"]].itertuples(index=False, name=None),
+                        bulk_date_str,
+                        bulk_period_str,
+                        int(start_no_input)
+                    )
+                summary_df = pd.DataFrame(summary)
+                generated = (summary_df["Status"] == "Generated").sum()
+                st.success(f"Generated {generated} of {len(summary_df)} invoices.")
+                st.dataframe(summary_df, use_container_width=True, hide_index=True)
+
+                col5, col6 = st.columns(2)
+                with col5:
+                    st.download_button(
+                        label="⬇️ Download All Invoices (ZIP)",
+                        data=zip_bytes,
+                        file_name=f"RCTI_{bulk_end.strftime('%Y%m%d')}.zip",
+                        mime="application/zip"
+                    )
+                with col6:
+                    st.download_button(
+                        label="⬇️ Download Summary (CSV)",
+                        data=summary_df.to_csv(index=False),
+                        file_name=f"RCTI_summary_{bulk_end.strftime('%Y%m%d')}.csv",
+                        mime="text/csv"
+                    )
@@ -4,9 +4,9 @@ from datetime import datetime
 import io
 import json
 import os
-import matplotlib.pyplot as plt
-import base64
-from io import BytesIO
+import sheet_cache
+import ielts_analytics
+import ielts_charts
 
 # Page configuration
 st.set_page_config(page_title="IELTS/PTE Report", page_icon="📚", layout="wide")
@@ -25,24 +25,43 @@ def load_config():
             return {}
     return {}
 
+@st.cache_data
+def load_student_ids(enrollment_names, payment_names):
+    # Cached on the name columns themselves, so ids are rebuilt only when a sheet changes
+    return ielts_analytics.student_ids(enrollment_names, payment_names)
+
 # Data URLs
 PAYMENT_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQxrqK_lupLKcWGYwHU2MWnnJw3xWZc_V8DDtuTELd3oF3CEjbQlF4KLsNfSvv3IbDvx8mIFHVl3bIW/pub?gid=904067204&single=true&output=csv"
 ENROLLMENT_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQxrqK_lupLKcWGYwHU2MWnnJw3xWZc_V8DDtuTELd3oF3CEjbQlF4KLsNfSvv3IbDvx8mIFHVl3bIW/pub?gid=0&single=true&output=csv"
 EXPENSES_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQxrqK_lupLKcWGYwHU2MWnnJw3xWZc_V8DDtuTELd3oF3CEjbQlF4KLsNfSvv3IbDvx8mIFHVl3bIW/pub?gid=1621737816&single=true&output=csv"
+SHEET_TIMEOUT = 20  # seconds per sheet
 
 # Load data automatically
 with st.spinner("Fetching data from Google Sheets..."):
     try:
-        # Fetch payment data
-        df_payments = pd.read_csv(PAYMENT_URL)
+        # Fetch all three sheets in parallel; a failing sheet is reported instead of hiding the others
+        sheets, sheet_errors = sheet_cache.fetch_sheets({
+            "Payment Transactions": PAYMENT_URL,
+            "Student Enrollment": ENROLLMENT_URL,
+            "Teacher Expenses": EXPENSES_URL
+        }, timeout=SHEET_TIMEOUT)
+        
+        for sheet_name, sheet_error in sheet_errors.items():
+            st.warning(f"⚠️ Could not load '{sheet_name}': {sheet_error}")
+        if "Payment Transactions" in sheet_errors or "Student Enrollment" in sheet_errors:
+            st.error("Payment and enrollment data are required for this report.")
+            st.stop()
+        
+        # Payment data
+        df_payments = sheets["Payment Transactions"]
         df_payments.columns = df_payments.columns.str.strip()
         
-        # Fetch enrollment data
-        df_enrollments = pd.read_csv(ENROLLMENT_URL)
+        # Enrollment data
+        df_enrollments = sheets["Student Enrollment"]
         df_enrollments.columns = df_enrollments.columns.str.strip()
         
-        # Fetch expenses data (teacher payments)
-        df_expenses = pd.read_csv(EXPENSES_URL)
+        # Expenses data (teacher payments) - report still works without it
+        df_expenses = sheets.get("Teacher Expenses", pd.DataFrame(columns=['Office', 'Teacher Name', 'Amount', 'Month']))
         df_expenses.columns = df_expenses.columns.str.strip()
         df_expenses['Month'] = pd.to_datetime(df_expenses['Month'], errors='coerce')
         df_expenses['MonthYear'] = df_expenses['Month'].dt.to_period('M').astype(str)  # Convert to string immediately
@@ -69,9 +88,14 @@ with st.spinner("Fetching data from Google Sheets..."):
         
         # Clean and normalize data
         df_payments['Date'] = pd.to_datetime(df_payments['Date'], errors='coerce')
-        df_payments['Students Name'] = df_payments['Students Name'].str.strip().str.lower()
+        df_payments['Students Name'] = df_payments['Students Name'].str.strip()
         df_payments['Course Type'] = df_payments['Course Type'].str.strip()
-        df_enrollments['Name'] = df_enrollments['Name'].str.strip().str.lower()
+        df_enrollments['Name'] = df_enrollments['Name'].str.strip()
+        
+        # Payments join enrollments on an integer student id instead of lowercased names
+        df_enrollments['student_id'], df_payments['student_id'] = load_student_ids(
+            df_enrollments['Name'], df_payments['Students Name']
+        )
         
         # Add month/year column for filtering
         df_payments['MonthYear'] = df_payments['Date'].dt.to_period('M').astype(str)
@@ -125,19 +149,11 @@ with st.spinner("Fetching data from Google Sheets..."):
         st.divider()
         
         # Calculate total paid per student from filtered data
-        payment_summary = df_payments_filtered.groupby('Students Name').agg({
-            'Paid Amount': 'sum'
-        }).reset_index()
-        payment_summary.columns = ['name', 'total_paid']
-        
-        # Merge with enrollment data
-        df_enrollments['name_lower'] = df_enrollments['Name']
-        df_analysis = df_enrollments.merge(
-            payment_summary, 
-            left_on='name_lower', 
-            right_on='name', 
-            how='left'
-        )
+        payment_summary = df_payments_filtered.groupby('student_id')['Paid Amount'].sum().rename('total_paid')
+        payment_summary = payment_summary.drop(-1, errors='ignore')  # blank names
+        
+        # Join with enrollment data
+        df_analysis = df_enrollments.join(payment_summary, on='student_id')
         
         # Fill NaN with 0 for students who haven't paid
         df_analysis['total_paid'] = df_analysis['total_paid'].fillna(0)
@@ -153,24 +169,8 @@ with st.spinner("Fetching data from Google Sheets..."):
         # Calculate balance
         df_analysis['balance'] = df_analysis['Payment'] - df_analysis['total_paid']
         
-        # Categorize students
-        def categorize_student(row):
-            note = str(row['Note']).lower() if pd.notna(row['Note']) else ''
-            balance = row.get('balance', 0)  # Safe get with default
-            total_paid = row.get('total_paid', 0)  # Safe get with default
-            
-            if 'ref' in note or 'reference' in note:
-                return '🎁 Reference'
-            elif 'dropped' in note:
-                return '📉 Dropped'
-            elif balance <= 0:
-                return '✅ Fully Paid'
-            elif total_paid > 0:
-                return '⚠️ Partial Payment'
-            else:
-                return '❌ Outstanding'
-        
-        df_analysis['status'] = df_analysis.apply(categorize_student, axis=1)
+        # Categorize students (vectorised; status is a Categorical)
+        df_analysis['status'] = ielts_analytics.classify_students(df_analysis)
         
         # CRITICAL: Use ENROLLMENT data as source of truth for students
         # Everyone in the enrollment sheet IS a student (IELTS/PTE)
@@ -226,7 +226,7 @@ with st.spinner("Fetching data from Google Sheets..."):
         # 2. NOT references (from Note field)
         # 3. Have balance > 0
         active_students_with_balance = df_students[
-            (~df_students['status'].isin(['📉 Dropped', '🎁 Reference'])) & 
+            (~df_students['status'].isin(ielts_analytics.NON_PAYING_STATUSES)) & 
             (df_students['balance'] > 0)
         ]
         total_outstanding = active_students_with_balance['balance'].sum()
@@ -251,32 +251,26 @@ with st.spinner("Fetching data from Google Sheets..."):
         col7.metric("📚 Book Only Revenue", f"NPR {total_book_revenue:,.0f}")
         col8.metric("⚠️ Outstanding", f"NPR {total_outstanding:,.0f}")
         
-        # Charts
+        # Charts (rendered once per data/period and shared with the email)
+        status_counts = df_students['status'].value_counts()
+        status_counts = status_counts[status_counts > 0]
+        charts = ielts_charts.render_charts(
+            status_counts,
+            {'IELTS/PTE Students': total_student_revenue, 'Books': total_book_revenue},
+            period=(start_date, end_date)
+        )
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("Student Status Breakdown")
-            if not df_students.empty:
-                status_counts = df_students['status'].value_counts()
-                fig1, ax1 = plt.subplots(figsize=(8, 6))
-                ax1.pie(status_counts.values, labels=status_counts.index, autopct='%1.1f%%', startangle=90)
-                ax1.axis('equal')
-                st.pyplot(fig1)
+            if charts['status']:
+                st.image(charts['status'], use_container_width=True)
             else:
                 st.info("No student data for selected period")
         
         with col2:
             st.subheader("Revenue Breakdown")
-            revenue_data = pd.DataFrame({
-                'Category': ['IELTS/PTE Students', 'Books'],
-                'Revenue': [total_student_revenue, total_book_revenue]
-            })
-            fig2, ax2 = plt.subplots(figsize=(8, 6))
-            revenue_data.plot(kind='bar', x='Category', y='Revenue', ax=ax2, color=['#3498db', '#e74c3c'], legend=False)
-            ax2.set_ylabel('Revenue (NPR)')
-            ax2.set_xlabel('')
-            plt.xticks(rotation=0)
-            st.pyplot(fig2)
+            st.image(charts['revenue'], use_container_width=True)
         
         st.divider()
         
@@ -301,7 +295,7 @@ with st.spinner("Fetching data from Google Sheets..."):
                 
                 # Show ALL students with outstanding balance (NOT filtered by month)
                 outstanding = df_students[
-                    (~df_students['status'].isin(['📉 Dropped', '🎁 Reference'])) &
+                    (~df_students['status'].isin(ielts_analytics.NON_PAYING_STATUSES)) &
                     (df_students['balance'].fillna(0) > 0)
                 ].copy()
                 
@@ -336,7 +330,7 @@ with st.spinner("Fetching data from Google Sheets..."):
         
         with tab2:
             st.subheader("Fully Paid Students")
-            fully_paid = df_students[df_students['status'] == '✅ Fully Paid'].copy()
+            fully_paid = df_students[df_students['status'] == ielts_analytics.STATUS_FULLY_PAID].copy()
             if not fully_paid.empty:
                 fully_paid_display = fully_paid[['Name', 'Office', 'Month', 'Payment', 'total_paid']]
                 fully_paid_display.columns = ['Name', 'Office', 'Month', 'Expected', 'Paid']
@@ -390,34 +384,8 @@ with st.spinner("Fetching data from Google Sheets..."):
             # Office revenue for selected period
             st.write(f"**Revenue & Students by Office ({start_date.strftime('%b %Y')} - {end_date.strftime('%b %Y')})**")
             
-            # Get actual students by office from enrollment data
-            office_breakdown = df_students.groupby('Office').agg({
-                'Name': 'count',
-                'status': lambda x: (x == '✅ Fully Paid').sum(),
-            }).reset_index()
-            office_breakdown.columns = ['Office', 'Total Students', 'Fully Paid']
-            
-            # Add revenue from payment data
-            office_revenue_map = df_payments_filtered.groupby('Office')['Paid Amount'].sum().to_dict()
-            office_breakdown['Revenue'] = office_breakdown['Office'].map(office_revenue_map).fillna(0)
-            
-            # Add outstanding, references, dropped counts
-            for office in office_breakdown['Office']:
-                office_students = df_students[df_students['Office'] == office]
-                # FIXED: Outstanding excludes dropped and references - count number of students
-                outstanding_count = len(
-                    office_students[
-                        (~office_students['status'].isin(['📉 Dropped', '🎁 Reference'])) &
-                        (office_students['balance'] > 0)
-                    ]
-                )
-                office_breakdown.loc[office_breakdown['Office'] == office, 'Outstanding'] = outstanding_count
-                office_breakdown.loc[office_breakdown['Office'] == office, 'References'] = (office_students['status'] == '🎁 Reference').sum()
-                office_breakdown.loc[office_breakdown['Office'] == office, 'Dropped'] = (office_students['status'] == '📉 Dropped').sum()
-            
-            # Reorder columns
-            office_breakdown = office_breakdown[['Office', 'Total Students', 'Fully Paid', 'Outstanding', 'References', 'Dropped', 'Revenue']]
-            office_breakdown['Revenue'] = office_breakdown['Revenue'].astype(int)
+            # One groupby over enrollment + period payments; the email below reuses this table
+            office_breakdown = ielts_analytics.office_breakdown(df_students, df_payments_filtered)
             st.dataframe(office_breakdown, use_container_width=True)
             
             # Smart Insights Section
@@ -425,8 +393,8 @@ with st.spinner("Fetching data from Google Sheets..."):
             
             # Calculate insights
             total_enrolled = len(df_students)
-            total_references = len(df_students[df_students['status'] == '🎁 Reference'])
-            total_dropped = len(df_students[df_students['status'] == '📉 Dropped'])
+            total_references = len(df_students[df_students['status'] == ielts_analytics.STATUS_REFERENCE])
+            total_dropped = len(df_students[df_students['status'] == ielts_analytics.STATUS_DROPPED])
             paying_students = total_enrolled - total_references
             
             col1, col2 = st.columns(2)
@@ -441,7 +409,7 @@ with st.spinner("Fetching data from Google Sheets..."):
             
             with col2:
                 # Payment completion rate
-                fully_paid_count = len(df_students[df_students['status'] == '✅ Fully Paid'])
+                fully_paid_count = len(df_students[df_students['status'] == ielts_analytics.STATUS_FULLY_PAID])
                 if paying_students > 0:
                     completion_rate = (fully_paid_count / paying_students) * 100
                     st.success(f"""
@@ -583,6 +551,12 @@ with st.spinner("Fetching data from Google Sheets..."):
              # Use HH:MM in subject, full seconds in body
              default_subject = f"IELTS/PTE Financial Report - {period_name} ({current_time_str[:5]})"
 
+        # Charts are referenced by Content-ID in the sent email; the preview swaps in data URIs
+        email_charts = {f"{name}_chart": png for name, png in charts.items() if png}
+        charts_html = "".join(
+            f'<img src="cid:{cid}" style="max-width:48%;height:auto;margin:4px">' for cid in email_charts
+        )
+        
         # Zero-width uniqueness hack: Add a variable number of zero-width spaces to the greeting
         import random
         zero_width_spaces = "&zwnj;" * random.randint(1, 10)
@@ -643,6 +617,8 @@ with st.spinner("Fetching data from Google Sheets..."):
 {expenses_table_html}
 <h2>🏢 Office Performance</h2>
 {office_breakdown.to_html(index=False, border=0)}
+<h2>📊 Charts</h2>
+{charts_html}
 <p style="margin-top:15px">Please review the detailed Excel report attached.</p>
 <p>Best regards,<br><strong>Ashish Shrestha</strong></p>
 <div style="color:#ffffff; font-size:1px; line-height:1px; opacity:0.01; user-select:none;">Ref: {current_time_str}</div>
@@ -655,7 +631,10 @@ with st.spinner("Fetching data from Google Sheets..."):
             st.markdown(f"**Subject:** {email_subject}")
             # st.markdown("**To:** " + recipients) # Removed as per user request
             # st.divider() # Removed as per user request
-            st.components.v1.html(html_body, height=800, scrolling=True)
+            preview_html = html_body
+            for cid, png in email_charts.items():
+                preview_html = preview_html.replace(f"cid:{cid}", ielts_charts.data_uri(png))
+            st.components.v1.html(preview_html, height=800, scrolling=True)
         
         if st.button("🚀 Send Email with Report", type="primary"):
             if not sender_email or not sender_password:
@@ -666,16 +645,26 @@ with st.spinner("Fetching data from Google Sheets..."):
                     from email.mime.multipart import MIMEMultipart
                     from email.mime.text import MIMEText
                     from email.mime.base import MIMEBase
+                    from email.mime.image import MIMEImage
                     from email import encoders
                     
-                    # Setup MIME
-                    msg = MIMEMultipart('alternative')
+                    # Setup MIME: mixed holds the body and the workbook,
+                    # related keeps the HTML together with the images it references by cid
+                    msg = MIMEMultipart('mixed')
                     msg['From'] = sender_email
                     msg['To'] = recipients
                     msg['Subject'] = email_subject
                     
-                    # Attach HTML body
-                    msg.attach(MIMEText(html_body, 'html'))
+                    body = MIMEMultipart('related')
+                    body.attach(MIMEText(html_body, 'html'))
+                    
+                    # Inline charts, same PNG bytes as the dashboard
+                    for cid, png in email_charts.items():
+                        image = MIMEImage(png, 'png')
+                        image.add_header('Content-ID', f"<{cid}>")
+                        image.add_header('Content-Disposition', 'inline', filename=f"{cid}.png")
+                        body.attach(image)
+                    msg.attach(body)
                     
                     # Attach Excel file
                     part = MIMEBase('application', 'octet-stream')
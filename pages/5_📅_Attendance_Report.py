@@ -4,16 +4,16 @@ import json
 import streamlit.components.v1 as components
 from datetime import time
 import smtplib
+import imaplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import os
 import io
 import xlsxwriter
-import imaplib
-import email
-from email.header import decode_header
-import re
 from datetime import datetime
+import attendance_history
+import leave_scanner
+import leave_index
 
 
 # PAGE SETUP
@@ -135,7 +135,7 @@ def send_email_simple(sender, password, recipient, subject, html_body):
     except Exception as e:
         return False, str(e)
 
-def process_attendance_simple(df):
+def extract_punches_simple(df):
     df.columns = df.columns.str.strip()
     
     name_col = None
@@ -152,60 +152,13 @@ def process_attendance_simple(df):
         st.error("⚠️ Could not find Name and Date/Time columns")
         return None
     
-    df['Timestamp'] = pd.to_datetime(df[datetime_col], dayfirst=True, errors='coerce')
-    df = df.dropna(subset=['Timestamp'])
-    df['Date'] = df['Timestamp'].dt.strftime('%Y-%m-%d')
-    df['Employee'] = df[name_col].astype(str).str.strip()
-    
-    results = []
-    grouped = df.groupby(['Employee', 'Date'])
-    
-    for (emp, date), group in grouped:
-        punches = group['Timestamp'].sort_values()
-        
-        if len(punches) < 1:
-            continue
-        
-        first_in = punches.iloc[0]
-        last_out = punches.iloc[-1]
-        work_hours = (last_out - first_in).total_seconds() / 3600
-        
-        # LOGIC UPDATES
-        is_late = first_in.time() > LATE_THRESHOLD
-        
-        if work_hours >= REQUIRED_HOURS:
-            is_early_exit = False
-        else:
-            is_early_exit = last_out.time() < EXIT_THRESHOLD
-        
-        is_compliant = work_hours >= REQUIRED_HOURS and not is_late
-        
-        if is_compliant:
-            note = "Compliant"
-        elif is_late and is_early_exit:
-            note = "Late Entry & Early Exit"
-        elif is_late:
-            note = "Late Entry"
-        elif is_early_exit:
-            note = "Early Exit"
-        else:
-            note = "Compliant"
-
-        results.append({
-            'Employee': emp,
-            'Date': date,
-            'FirstIn': first_in.strftime('%H:%M:%S'),
-            'LastOut': last_out.strftime('%H:%M:%S'),
-            'WorkHours': round(work_hours, 1),
-            'IsLate': bool(is_late),
-            'IsEarlyExit': bool(is_early_exit),
-            'IsCompliant': bool(is_compliant),
-            'Note': note
-        })
-    
-    return pd.DataFrame(results)
+    punches = pd.DataFrame({
+        'Employee': df[name_col].astype(str).str.strip(),
+        'Timestamp': pd.to_datetime(df[datetime_col], dayfirst=True, errors='coerce')
+    })
+    return punches.dropna(subset=['Timestamp'])
 
-def process_attendance_chabahil(df):
+def extract_punches_chabahil(df):
     df.columns = df.columns.str.strip()
     
     # Columns expected: 'First Name', 'Last Name', 'Date', 'Check-In Time'
@@ -230,67 +183,47 @@ def process_attendance_chabahil(df):
         return None
 
     # Combine names
-    df['Employee'] = df[first_name_col].astype(str).str.strip() + " " + df[last_name_col].astype(str).str.strip()
+    employee = df[first_name_col].astype(str).str.strip() + " " + df[last_name_col].astype(str).str.strip()
     
     # Combine date and time
     try:
-        df['Timestamp_str'] = df[date_col].astype(str) + ' ' + df[time_col].astype(str)
-        df['Timestamp'] = pd.to_datetime(df['Timestamp_str'], errors='coerce')
+        timestamp = pd.to_datetime(df[date_col].astype(str) + ' ' + df[time_col].astype(str), errors='coerce')
     except Exception as e:
         st.error(f"⚠️ Error parsing Date/Time columns: {e}")
         return None
 
-    df = df.dropna(subset=['Timestamp'])
-    df['Date'] = df['Timestamp'].dt.strftime('%Y-%m-%d')
-    
-    results = []
-    grouped = df.groupby(['Employee', 'Date'])
-    
-    for (emp, date), group in grouped:
-        punches = group['Timestamp'].sort_values()
-        
-        if len(punches) < 1:
-            continue
-        
-        first_in = punches.iloc[0]
-        last_out = punches.iloc[-1]
-        
-        # If only 1 punch, they checked in but never out. We will consider work_hours as 0 or calculate using just first_in
-        work_hours = (last_out - first_in).total_seconds() / 3600
-        
-        is_late = first_in.time() > LATE_THRESHOLD
-        
-        if work_hours >= REQUIRED_HOURS:
-            is_early_exit = False
-        else:
-            is_early_exit = last_out.time() < EXIT_THRESHOLD
-            
-        is_compliant = work_hours >= REQUIRED_HOURS and not is_late
-        
-        if is_compliant:
-            note = "Compliant"
-        elif is_late and is_early_exit:
-            note = "Late Entry & Early Exit"
-        elif is_late:
-            note = "Late Entry"
-        elif is_early_exit:
-            note = "Early Exit"
+    punches = pd.DataFrame({'Employee': employee, 'Timestamp': timestamp})
+    return punches.dropna(subset=['Timestamp'])
+
+def process_punches(punches):
+    # If only 1 punch, they checked in but never out, so work hours come out as 0
+    return attendance_history.summarise_punches(
+        punches,
+        required_hours=REQUIRED_HOURS,
+        late_threshold=LATE_THRESHOLD,
+        exit_threshold=EXIT_THRESHOLD
+    )
+
+def record_history(branch, uploaded, punches):
+    """Append this upload's punches to the history store once per session"""
+    upload_key = f"history_{branch}_{uploaded.name}_{uploaded.size}"
+    if st.session_state.get(upload_key):
+        return
+    try:
+        added = attendance_history.ingest(
+            branch,
+            punches,
+            required_hours=REQUIRED_HOURS,
+            late_threshold=LATE_THRESHOLD,
+            exit_threshold=EXIT_THRESHOLD
+        )
+        st.session_state[upload_key] = True
+        if added:
+            st.caption(f"🗄️ Saved {added} new punches to attendance history.")
         else:
-            note = "Compliant"
-
-        results.append({
-            'Employee': emp,
-            'Date': date,
-            'FirstIn': first_in.strftime('%H:%M:%S'),
-            'LastOut': last_out.strftime('%H:%M:%S'),
-            'WorkHours': round(work_hours, 1),
-            'IsLate': bool(is_late),
-            'IsEarlyExit': bool(is_early_exit),
-            'IsCompliant': bool(is_compliant),
-            'Note': note
-        })
-    
-    return pd.DataFrame(results)
+            st.caption("🗄️ This file is already in attendance history.")
+    except Exception as e:
+        st.warning(f"Could not update attendance history: {e}")
 
 # --- EMAIL LEAVE TRACKER HELPERS ---
 
@@ -309,55 +242,6 @@ def save_email_credentials(email, password):
     with open(CREDENTIALS_FILE, "w") as f:
         json.dump({"email": email, "password": password}, f)
 
-def extract_name_from_signature(body):
-    patterns = [
-        r"(?:Best regards|Regards|Thanks|Cheers|Sincerely)[,\s]*\n\s*([A-Z][a-z]+ [A-Z][a-z]+)",
-        r"(?:Best regards|Regards|Thanks|Cheers|Sincerely)[,\s]*\n\s*([A-Z][a-z]+)"
-    ]
-    for p in patterns:
-        match = re.search(p, body, re.IGNORECASE | re.MULTILINE)
-        if match:
-            return match.group(1).strip()
-    return None
-
-def connect_to_gmail(username, password):
-    try:
-        mail = imaplib.IMAP4_SSL("imap.gmail.com")
-        mail.login(username, password)
-        return mail
-    except Exception as e:
-        return str(e)
-
-def extract_leave_details(subject, body):
-    subject_lower = subject.lower()
-    body_lower = body.lower()
-    
-    status = "Unknown"
-    if "sick" in subject_lower or "sick" in body_lower:
-        status = "Sick Leave"
-    elif "half" in subject_lower:
-        status = "Half Day"
-    elif "vacation" in subject_lower or "holiday" in subject_lower:
-        status = "Vacation"
-    elif "wfh" in subject_lower or "working from home" in subject_lower:
-        status = "WFH"
-    elif "early" in subject_lower or "departure" in subject_lower:
-        status = "Early Leave"
-    elif "application" in subject_lower or "request" in subject_lower:
-        status = "Leave Request"
-    return status
-
-def get_email_content(msg):
-    if msg.is_multipart():
-        for part in msg.walk():
-            content_type = part.get_content_type()
-            content_disposition = str(part.get("Content-Disposition"))
-            if content_type == "text/plain" and "attachment" not in content_disposition:
-                return part.get_payload(decode=True).decode()
-    else:
-        return msg.get_payload(decode=True).decode()
-    return ""
-
 # PURE HTML/JS DASHBOARD TEMPLATE
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -1017,7 +901,7 @@ HTML_TEMPLATE = """
 # MAIN APP LOGIC AND TABS
 st.markdown("<h2 style='text-align: center;'>Attendance & Leave Management</h2>", unsafe_allow_html=True)
 
-tab_attendance, tab_chabahil, tab_leave = st.tabs(["📊 Putalisadak Attendance", "🏢 Chabahil Attendance", "📧 Email Leave Tracker"])
+tab_attendance, tab_chabahil, tab_leave, tab_history = st.tabs(["📊 Putalisadak Attendance", "🏢 Chabahil Attendance", "📧 Email Leave Tracker", "📈 Attendance History"])
 
 # --- TAB 1: EXISTING ATTENDANCE REPORT (PUTALISADAK) ---
 with tab_attendance:
@@ -1035,10 +919,13 @@ with tab_attendance:
             elif file_name.endswith('.xlsx'):
                 df_raw = pd.read_excel(uploaded_file, engine='openpyxl')
                 
-            df_daily = process_attendance_simple(df_raw)
+            punches = extract_punches_simple(df_raw)
+            df_daily = process_punches(punches) if punches is not None else None
             
             # EXPORT BUTTON (Accounts)
             if df_daily is not None and not df_daily.empty:
+                record_history("Putalisadak", uploaded_file, punches)
+                
                 excel_data = generate_excel_report(df_daily)
                 st.download_button(
                     label="📥 Download Accounts Excel",
@@ -1103,10 +990,13 @@ with tab_chabahil:
             elif file_name.endswith('.xlsx'):
                 df_raw_c = pd.read_excel(uploaded_file_c, engine='openpyxl', skiprows=skip_rows)
                 
-            df_daily_c = process_attendance_chabahil(df_raw_c)
+            punches_c = extract_punches_chabahil(df_raw_c)
+            df_daily_c = process_punches(punches_c) if punches_c is not None else None
             
             # EXPORT BUTTON (Accounts)
             if df_daily_c is not None and not df_daily_c.empty:
+                record_history("Chabahil", uploaded_file_c, punches_c)
+                
                 excel_data_c = generate_excel_report(df_daily_c)
                 
                 # We specifically use octet-stream for Chabahil initially if the old way completely failed for them, 
@@ -1180,17 +1070,23 @@ with tab_leave:
                 filter_end_date = st.date_input("End Date", datetime(datetime.now().year, 12, 31))
             
             search_query = st.text_input("Search Keywords (Subject)", value='Leave OR Sick OR WFH OR Day off OR Vacation OR Departure OR Application')
-            limit = st.slider("Max Emails to Scan", 10, 100, 50)
+            
+            col_k, col_s = st.columns(2)
+            with col_k:
+                subject_filter = st.text_input("Subject Contains", placeholder="e.g. sick", help="Filters saved results without contacting Gmail")
+            with col_s:
+                staff_options = ["All Staff"] + (leave_index.staff_names(email_user) if email_user else [])
+                staff_filter = st.selectbox("Staff Member", staff_options)
             
     # Action Button
-    fetch_btn = st.button("🔍 Find Leave Emails", type="primary")
+    fetch_btn = st.button("🔍 Find Leave Emails", type="primary", help="Checks Gmail for new leave emails and adds them to the local index")
 
     if fetch_btn:
         if not email_user or not email_pass:
             st.error("Please enter both Gmail Address and App Password.")
         else:
             with st.spinner("Connecting to Gmail..."):
-                mail = connect_to_gmail(email_user, email_pass)
+                mail = leave_scanner.connect_to_gmail(email_user, email_pass)
                 
                 if isinstance(mail, str): # Error message
                     st.error(f"Failed to connect: {mail}")
@@ -1200,132 +1096,122 @@ with tab_leave:
                     # Save credentials
                     save_email_credentials(email_user, email_pass)
                     
-                    mail.select("inbox")
-                    
-                    # Strategy: Fetch latest N emails and filter in Python
-                    _, msg_data = mail.search(None, "ALL")
-                    all_email_ids = msg_data[0].split()
-                    email_ids = all_email_ids[::-1][:limit]
-                    
-                    leaves = []
-                    progress_bar = st.progress(0)
                     text_status = st.empty()
                     
-                    # Prepare keywords
-                    clean_query = search_query.replace("subject:(", "").replace(")", "").replace('"', "")
-                    keywords = [k.strip() for k in clean_query.split("OR") if k.strip()]
-                    
-                    for i, e_id in enumerate(email_ids):
-                        text_status.text(f"Scanning email {i+1}/{len(email_ids)}...")
-                        
-                        # Request X-GM-THRID (Thread ID) for better links, along with the body
-                        _, msg_data = mail.fetch(e_id, "(RFC822 X-GM-THRID)")
-                        
-                        email_body_data = None
-                        thread_id = None
-                        
-                        for response_part in msg_data:
-                            if isinstance(response_part, tuple):
-                                metadata = response_part[0].decode()
-                                if "X-GM-THRID" in metadata:
-                                    try:
-                                        thrid_match = re.search(r'X-GM-THRID\s+(\d+)', metadata)
-                                        if thrid_match:
-                                            thread_id = thrid_match.group(1)
-                                    except:
-                                        pass
-                                email_body_data = response_part[1]
-                        
-                        if email_body_data:
-                            msg = email.message_from_bytes(email_body_data)
-                            
-                            # Subject
-                            subject, encoding = decode_header(msg["Subject"])[0]
-                            if isinstance(subject, bytes):
-                                subject = subject.decode(encoding if encoding else "utf-8")
-                                
-                            # From
-                            from_ = msg.get("From")
-                            sender_name = from_.split("<")[0].replace('"', '').strip()
-                            
-                            # Body
-                            body = get_email_content(msg)
-                            
-                            # Filter
-                            match_found = False
-                            for key in keywords:
-                                if key.lower() in subject.lower():
-                                    match_found = True
-                                    break
-                            
-                            if not match_found:
-                                continue 
-                            
-                            # Details
-                            signature_name = extract_name_from_signature(body)
-                            display_name = signature_name if signature_name else sender_name
-                            email_date_obj = email.utils.parsedate_to_datetime(msg.get("Date"))
-                            leave_status = extract_leave_details(subject, body)
-                            
-                            # Link
-                            link = "#"
-                            if thread_id:
-                                try:
-                                    hex_thrid = hex(int(thread_id))[2:] 
-                                    link = f"https://mail.google.com/mail/u/0/#inbox/{hex_thrid}"
-                                except:
-                                    pass
-                            
-                            if link == "#":
-                                message_id = msg.get("Message-ID", "").strip()
-                                clean_msg_id = "".join(message_id.split()).replace("<", "").replace(">", "")
-                                link = f"https://mail.google.com/mail/u/0/#search/rfc822msgid%3A{clean_msg_id}"
-                            
-                            # Date Check
-                            email_date_only = email_date_obj.date()
-                            if filter_start_date <= email_date_only <= filter_end_date:
-                                leaves.append({
-                                    "Name": display_name,
-                                    "Sender": sender_name,
-                                    "Date": email_date_obj.strftime("%b %d, %Y"),
-                                    "Status": leave_status,
-                                    "Subject": subject,
-                                    "Link": link
-                                })
-                        
-                        progress_bar.progress((i + 1) / len(email_ids))
-                    
-                    text_status.empty()
-                    st.subheader(f"Found {len(leaves)} potential leave emails")
+                    try:
+                        # Server-side search, header-only prefetch and a UID watermark,
+                        # so repeat scans only download mail that arrived since the last one
+                        added = leave_scanner.scan_leave_emails(
+                            mail,
+                            email_user,
+                            search_query,
+                            filter_start_date,
+                            filter_end_date,
+                            connect=lambda: leave_scanner.connect_to_gmail(email_user, email_pass),
+                            progress_callback=text_status.text
+                        )
                     
-                    if leaves:
-                        leaves_by_staff = {}
-                        for leave in leaves:
-                            name = leave['Name']
-                            if name not in leaves_by_staff:
-                                leaves_by_staff[name] = []
-                            leaves_by_staff[name].append(leave)
-                            
-                        sorted_names = sorted(leaves_by_staff.keys())
-                        
-                        for name in sorted_names:
-                            staff_leaves = leaves_by_staff[name]
-                            with st.container():
-                                st.markdown(f"### {name}")
-                                for leave in staff_leaves:
-                                    c1, c2, c3, c4 = st.columns([2, 2, 2, 1])
-                                    with c1: st.caption(leave['Date'])
-                                    with c2:
-                                        color = "grey"
-                                        if "Sick" in leave['Status']: color = "red"
-                                        elif "Vacation" in leave['Status']: color = "green"
-                                        elif "Half" in leave['Status']: color = "orange"
-                                        elif "WFH" in leave['Status']: color = "blue"
-                                        st.markdown(f":{color}[{leave['Status']}]")
-                                    with c3: st.markdown(f"*{leave['Subject']}*")
-                                    with c4: st.markdown(f"[View]({leave['Link']})")
-                                st.divider()
-                    else:
-                        st.info("No matching emails found.")
-
-                    mail.logout()
+                        text_status.empty()
+                        st.caption(f"Indexed {added} new leave emails.")
+                    except imaplib.IMAP4.error as e:
+                        text_status.empty()
+                        st.error(f"Leave scan failed: {e}. The leave index was not updated; please try again.")
+                    finally:
+                        try:
+                            mail.logout()
+                        except Exception:
+                            pass
+
+    # Results come from the local index, so changing filters needs no IMAP round trip
+    if email_user:
+        df_leaves = leave_index.query_leaves(
+            email_user,
+            filter_start_date,
+            filter_end_date,
+            keyword=subject_filter or None,
+            staff=None if staff_filter == "All Staff" else staff_filter
+        )
+        
+        if fetch_btn or not df_leaves.empty:
+            st.subheader(f"Found {len(df_leaves)} potential leave emails")
+        
+        if not df_leaves.empty:
+            df_leaves['Date'] = pd.to_datetime(df_leaves['date']).dt.strftime("%b %d, %Y")
+            
+            for name, staff_leaves in df_leaves.groupby('name', sort=True):
+                with st.container():
+                    st.markdown(f"### {name}")
+                    for leave in staff_leaves.itertuples(index=False):
+                        c1, c2, c3, c4 = st.columns([2, 2, 2, 1])
+                        with c1: st.caption(leave.Date)
+                        with c2:
+                            color = "grey"
+                            if "Sick" in leave.status: color = "red"
+                            elif "Vacation" in leave.status: color = "green"
+                            elif "Half" in leave.status: color = "orange"
+                            elif "WFH" in leave.status: color = "blue"
+                            st.markdown(f":{color}[{leave.status}]")
+                        with c3: st.markdown(f"*{leave.subject}*")
+                        with c4: st.markdown(f"[View]({leave.link})")
+                    st.divider()
+        elif fetch_btn:
+            st.info("No matching emails found.")
+
+# --- TAB 4: MULTI-MONTH ATTENDANCE HISTORY ---
+with tab_history:
+    st.info("Quarter and year views built from every attendance file processed so far.")
+    
+    col_b, col_y, col_p = st.columns(3)
+    with col_b:
+        hist_branch = st.selectbox("Branch", ["Putalisadak", "Chabahil"], key="hist_branch")
+    
+    hist_months = attendance_history.list_months(hist_branch)
+    
+    if not hist_months:
+        st.info("No history yet. Upload an attendance sheet for this branch to start building it.")
+    else:
+        hist_years = sorted({m[:4] for m in hist_months}, reverse=True)
+        with col_y:
+            hist_year = st.selectbox("Year", hist_years, key="hist_year")
+        with col_p:
+            hist_period = st.selectbox("Period", ["Full Year", "Q1", "Q2", "Q3", "Q4"], key="hist_period")
+        
+        if hist_period == "Full Year":
+            start_m, end_m = 1, 12
+        else:
+            q = int(hist_period[1])
+            start_m, end_m = (q - 1) * 3 + 1, q * 3
+        start_month = f"{hist_year}-{start_m:02d}"
+        end_month = f"{hist_year}-{end_m:02d}"
+        
+        hist_stats = attendance_history.load_rollup(
+            hist_branch, start_month, end_month,
+            required_hours=REQUIRED_HOURS,
+            chronic_late_threshold=CHRONIC_LATE_THRESHOLD
+        )
+        hist_trend = attendance_history.load_trend(hist_branch, start_month, end_month)
+        
+        if hist_stats.empty:
+            st.info("No attendance recorded for this period.")
+        else:
+            covered = ", ".join(hist_trend['Month'])
+            st.caption(f"Months on record: {covered}")
+            
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Employees", len(hist_stats))
+            m2.metric("Avg Attendance", f"{hist_stats['AttendancePct'].mean():.1f}%")
+            m3.metric("Chronic Late", int(hist_stats['ChronicLate'].sum()))
+            m4.metric("Under 8hrs", int(hist_stats['UnderHours'].sum()))
+            
+            st.subheader("Monthly Trend")
+            st.line_chart(hist_trend.set_index('Month')[['LatePct', 'AvgWorkHours']])
+            
+            st.subheader("Chronic Late Employees")
+            chronic = hist_stats[hist_stats['ChronicLate']].sort_values('LateDays', ascending=False)
+            if chronic.empty:
+                st.success("✅ No chronic late employees in this period.")
+            else:
+                st.dataframe(chronic[['Employee', 'PresentDays', 'LateDays', 'EarlyExitDays', 'AvgWorkHours']], hide_index=True, use_container_width=True)
+            
+            with st.expander("All Employees"):
+                st.dataframe(hist_stats.sort_values('TotalRiskDays', ascending=False), hide_index=True, use_container_width=True)
@@ -1,6 +1,9 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import os
+from datetime import date
+import employee_directory
+import hr_analytics
 
 # Page configuration
 st.set_page_config(
@@ -18,13 +21,41 @@ st.divider()
 # Load and display the HTML dashboard
 html_file_path = os.path.join(os.path.dirname(__file__), "..", "hr_analytics_dashboard.html")
 
+
+@st.cache_data
+def load_dashboard_template(path, mtime):
+    # Read once per file version rather than on every rerun
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@st.cache_data(max_entries=4)
+def load_dashboard(mtime, fetched_at, today, _directory):
+    """
+    Dashboard HTML with the aggregates inlined. Keyed on the directory fetch
+    time, so it is rebuilt only when the employee data (or the day) changes
+    and the iframe receives identical HTML on every other rerun.
+    """
+    employees = [hr_analytics.normalize_employee(e) for e in _directory.employees]
+    fx_rates = hr_analytics.load_fx_rates({e["salary_currency"] for e in employees}, today)
+    aggregates = hr_analytics.build_aggregates(_directory.employees, fx_rates)
+    script = f"<script>window.HR_AGGREGATES = {hr_analytics.to_json(aggregates)};</script>"
+    return load_dashboard_template(html_file_path, mtime).replace("<!-- HR_AGGREGATES -->", script, 1)
+
+
 try:
-    with open(html_file_path, 'r', encoding='utf-8') as f:
-        html_content = f.read()
-    
+    mtime = os.path.getmtime(html_file_path)
+    try:
+        directory = employee_directory.get_directory()
+        html_content = load_dashboard(mtime, directory.fetched_at, date.today(), directory)
+    except Exception as e:
+        # The dashboard can still fetch and aggregate in the browser
+        st.warning(f"Could not precompute HR analytics ({e}); loading live in the dashboard.")
+        html_content = load_dashboard_template(html_file_path, mtime)
+
     # Display the HTML dashboard in an iframe
     components.html(html_content, height=1200, scrolling=True)
-    
+
 except FileNotFoundError:
     st.error("❌ HR Analytics Dashboard HTML file not found!")
     st.info("Please ensure 'hr_analytics_dashboard.html' is in the root directory.")
@@ -77,6 +108,7 @@ with st.expander("ℹ️ About HR Analytics Dashboard"):
     
     Connected to Cloudflare Worker API:
     - Live data from Notion database
-    - Real-time FX rate conversions
+    - Daily NRB FX rates from the local rate table (fx_rates.py)
+    - KPIs, breakdowns and payroll totals precomputed once per data refresh
     - Automatic updates
     """)
@@ -1,10 +1,8 @@
 import streamlit as st
 import pandas as pd
 import os
-import io
-import requests
-from docx import Document
-import re
+import docx_templates
+import employee_directory
 
 st.set_page_config(page_title="HR Document Generator", page_icon="📝", layout="wide")
 
@@ -27,8 +25,8 @@ if not st.session_state["hr_auth"]:
 st.title("📝 HR Document Generator")
 st.markdown("Generate official Profit / Experience letters linked to live Notion data.")
 
-# API Configuration
-API_URL = "https://hr-api.ashishoct34.workers.dev/api/hr"
+# Configuration
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
 
 # --- HELPER FUNCTIONS ---
 def money_in_words(num):
@@ -78,73 +76,19 @@ def money_in_words(num):
         
     return " ".join(words) + " only"
 
-def get_employees():
-    """Fetch employees from Cloudflare Worker"""
-    try:
-        data = requests.get(API_URL).json()
-        return data.get('employees', [])
-    except Exception as e:
-        st.error(f"Error fetching data: {e}")
-        return []
-
-def fill_template(template_path, data):
-    """Replace placeholders in docx"""
-    doc = Document(template_path)
-    
-    def replace_text(paragraph):
-        for key, value in data.items():
-            # Support {{Key}} and <Key> and [Key]
-            patterns = [f"{{{{{key}}}}}", f"<{key}>", f"[{key}]"]
-            for p in patterns:
-                if p in paragraph.text:
-                    paragraph.text = paragraph.text.replace(p, str(value))
-    
-    for p in doc.paragraphs:
-        replace_text(p)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    replace_text(p)
-                    
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
-
-# --- 1. LOAD DATA ---
-with st.spinner("Fetching employee data from Notion..."):
-    employees = get_employees()
-
-if not employees:
-    st.stop()
-
-# --- 2. SELECT EMPLOYEE ---
-employee_names = sorted([e.get('name', 'Unknown') for e in employees])
-selected_name = st.selectbox("👤 Select Employee", employee_names)
-
-# Get full employee object
-employee = next((e for e in employees if e['name'] == selected_name), None)
-
-if employee:
-    # --- 3. SHOW DETAILS ---
-    with st.expander("📄 View Employee Details", expanded=True):
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.write(f"**Name:** {employee.get('name')}")
-            st.write(f"**ID:** {employee.get('employee_id', 'N/A')}")
-            st.write(f"**Designation:** {employee.get('designation', 'N/A')}")
-        with col2:
-            st.write(f"**Join Date:** {employee.get('joining_date', 'N/A')}")
-            st.write(f"**Gender:** {employee.get('gender', 'N/A')}")
-            st.write(f"**PAN:** {employee.get('pan', 'N/A')}")
-        with col3:
-             st.write(f"**Salary:** NPR {employee.get('last_salary', 0):,.2f}")
-             st.write(f"**Email:** {employee.get('email', 'N/A')}")
+# Current Date Format: January 29th, 2026
+def get_ordinal_date(date_obj):
+    day = date_obj.day
+    if 4 <= day <= 20 or 24 <= day <= 30:
+        suffix = "th"
+    else:
+        suffix = ["st", "nd", "rd"][day % 10 - 1]
+    return date_obj.strftime(f"%B {day}{suffix}, %Y")
 
-    st.divider()
+formatted_today = get_ordinal_date(pd.Timestamp.now())
 
-    # --- 4. DATA PREPARATION ---
+def employee_template_data(employee, today):
+    """Placeholder values for a Notion employee record"""
     # Gender Logic
     gender = employee.get('gender', '').lower()
     is_female = "female" in gender
@@ -170,17 +114,6 @@ if employee:
             join_date_fmt = ""
     except:
         join_date_fmt = join_date_raw
-    
-    # Current Date Format: January 29th, 2026
-    def get_ordinal_date(date_obj):
-        day = date_obj.day
-        if 4 <= day <= 20 or 24 <= day <= 30:
-            suffix = "th"
-        else:
-            suffix = ["st", "nd", "rd"][day % 10 - 1]
-        return date_obj.strftime(f"%B {day}{suffix}, %Y")
-
-    formatted_today = get_ordinal_date(pd.Timestamp.now())
 
     # Salary Logic
     salary_num = employee.get('last_salary', 0)
@@ -191,7 +124,7 @@ if employee:
     basic_val = salary_num * 0.60
     allowance_val = salary_num * 0.40
     
-    template_data = {
+    return {
         "Name": f"{title} {employee.get('name', '')}", 
         "OnlyName": employee.get('name', ''),
         "Title": title,
@@ -214,11 +147,58 @@ if employee:
         "SalaryWords": salary_words,
         "Department": employee.get('department', ''),
         "PAN": employee.get('pan', 'N/A'),
-        "Date": formatted_today,
+        "Date": today,
         "ReportingManager": employee.get('reporting_manager', 'Office Manager'),
         "Responsibilities": "" 
     }
 
+def zip_safe(text):
+    """Text usable in a ZIP member name: no path separators"""
+    return str(text).replace("/", "-").replace("\\", "-")
+
+def get_employees():
+    """Employee directory from the Cloudflare Worker, cached across reruns and sessions"""
+    try:
+        return employee_directory.get_directory()
+    except Exception as e:
+        st.error(f"Error fetching data: {e}")
+        return None
+
+# --- 1. LOAD DATA ---
+with st.spinner("Fetching employee data from Notion..."):
+    directory = get_employees()
+
+if not directory or not directory.employees:
+    st.stop()
+employees = directory.employees
+
+# --- 2. SELECT EMPLOYEE ---
+selected_name = st.selectbox("👤 Select Employee", directory.names())
+
+# Get full employee object
+employee = directory.by_name.get(selected_name)
+
+if employee:
+    # --- 3. SHOW DETAILS ---
+    with st.expander("📄 View Employee Details", expanded=True):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.write(f"**Name:** {employee.get('name')}")
+            st.write(f"**ID:** {employee.get('employee_id', 'N/A')}")
+            st.write(f"**Designation:** {employee.get('designation', 'N/A')}")
+        with col2:
+            st.write(f"**Join Date:** {employee.get('joining_date', 'N/A')}")
+            st.write(f"**Gender:** {employee.get('gender', 'N/A')}")
+            st.write(f"**PAN:** {employee.get('pan', 'N/A')}")
+        with col3:
+             st.write(f"**Salary:** NPR {employee.get('last_salary', 0):,.2f}")
+             st.write(f"**Email:** {employee.get('email', 'N/A')}")
+
+    st.divider()
+
+    # --- 4. DATA PREPARATION ---
+    template_data = employee_template_data(employee, formatted_today)
+
     # Debug info for user
     # st.write(template_data) 
     
@@ -236,8 +216,6 @@ if employee:
     # --- 5. GENERATE DOCUMENTS (Notion Based) ---
     col_sal, col_exp = st.columns(2)
     
-    TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
-    
     with col_sal:
         st.subheader("💰 Salary Certificate")
         st.info("Generates certificate using Notion data.")
@@ -247,7 +225,7 @@ if employee:
         
         if os.path.exists(sal_path):
             if st.button("Generate Salary Cert"):
-                doc_buffer = fill_template(sal_path, template_data)
+                doc_buffer = docx_templates.fill_template(sal_path, template_data)
                 st.download_button(
                     label="⬇️ Download DOCX",
                     data=doc_buffer,
@@ -271,7 +249,7 @@ if employee:
         
         if os.path.exists(exp_path):
              if st.button("Generate Exp Letter"):
-                doc_buffer = fill_template(exp_path, exp_data)
+                doc_buffer = docx_templates.fill_template(exp_path, exp_data)
                 st.download_button(
                     label="⬇️ Download DOCX",
                     data=doc_buffer,
@@ -283,7 +261,63 @@ if employee:
 
     st.divider()
 
-# --- 6. MANUAL CONTRACT GENERATION (New Hires) ---
+# --- 6. BULK GENERATION (Notion Based) ---
+st.header("📦 Bulk Generation")
+st.caption("Generate a document for every matching employee and download them as one ZIP.")
+
+BULK_TEMPLATES = {
+    "Salary Certificate": "Salary Certificate.docx",
+    "Experience Letter": "Experience Letter.docx"
+}
+
+bk_col1, bk_col2 = st.columns(2)
+with bk_col1:
+    bulk_doc = st.selectbox("Document", list(BULK_TEMPLATES))
+    bulk_filter = st.radio("Employees", ["All", "Department", "Status"], horizontal=True)
+with bk_col2:
+    if bulk_filter == "All":
+        bulk_employees = employees
+    else:
+        field = bulk_filter.lower()
+        options = sorted({e.get(field) or "Unknown" for e in employees})
+        chosen = st.multiselect(bulk_filter, options, default=options[:1])
+        bulk_employees = [e for e in employees if (e.get(field) or "Unknown") in chosen]
+    st.metric("Matching Employees", len(bulk_employees))
+
+bulk_path = os.path.join(TEMPLATE_DIR, BULK_TEMPLATES[bulk_doc])
+if st.button(f"Generate {len(bulk_employees)} Documents", disabled=not bulk_employees):
+    if not os.path.exists(bulk_path):
+        st.error(f"Template '{BULK_TEMPLATES[bulk_doc]}' not found.")
+    else:
+        documents = []
+        used_names = set()
+        for e in bulk_employees:
+            stem = f"{bulk_doc.replace(' ', '_')}_{zip_safe(e.get('name') or 'Unknown')}"
+            file_name = f"{stem}.docx"
+            # Two staff with the same name get their employee id appended, then a counter
+            if file_name in used_names and e.get('employee_id'):
+                stem = f"{stem}_{zip_safe(e['employee_id'])}"
+                file_name = f"{stem}.docx"
+            counter = 2
+            while file_name in used_names:
+                file_name = f"{stem}_{counter}.docx"
+                counter += 1
+            used_names.add(file_name)
+            documents.append((file_name, employee_template_data(e, formatted_today)))
+        
+        with st.spinner(f"Generating {len(documents)} documents..."):
+            zip_bytes = docx_templates.render_zip(bulk_path, documents)
+        st.success(f"Generated {len(documents)} documents.")
+        st.download_button(
+            label="⬇️ Download ZIP",
+            data=zip_bytes,
+            file_name=f"{bulk_doc.replace(' ', '_')}s_{pd.Timestamp.now().strftime('%Y-%m-%d')}.zip",
+            mime="application/zip"
+        )
+
+st.divider()
+
+# --- 7. MANUAL CONTRACT GENERATION (New Hires) ---
 st.header("🤝 New Hire Contract (Manual Entry)")
 st.caption("Use this for new employees who are not yet in Notion.")
 
@@ -347,7 +381,7 @@ if st.button("Generate New Hire Contract"):
         # 4. Generate
         cont_path = os.path.join(TEMPLATE_DIR, "Employment Contract Fixed.docx")
         if os.path.exists(cont_path):
-             doc_buffer = fill_template(cont_path, m_data)
+             doc_buffer = docx_templates.fill_template(cont_path, m_data)
              st.success(f"Generated Contract for {m_name}!")
              st.download_button(
                 label="⬇️ Download Contract",
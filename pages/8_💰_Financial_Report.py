@@ -1,11 +1,11 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import io
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-import requests
+import financial_ledger
+import sheet_cache
 
 # 1. PAGE SETUP
 st.set_page_config(page_title="Financial Report", page_icon="💰", layout="wide")
@@ -30,13 +30,13 @@ SHEET_URL = 'https://docs.google.com/spreadsheets/d/e/2PACX-1vSbLilDFS9QkZu0nGo1
 
 @st.cache_data(ttl=600)
 def load_data():
-    return pd.read_csv(SHEET_URL)
+    return sheet_cache.fetch_sheet(SHEET_URL)
 
-def parse_amount(val):
-    if isinstance(val, (int, float)): return val
-    if isinstance(val, str):
-        return float(val.replace(',', ''))
-    return 0
+@st.cache_data(ttl=600)
+def load_month_cube():
+    """Parses the sheet once per load and precomputes every month's figures"""
+    df = financial_ledger.prepare_transactions(load_data())
+    return financial_ledger.build_month_cube(df)
 
 def format_currency(val):
     return f"NPR {val:,.2f}"
@@ -46,31 +46,11 @@ st.write("Live financial overview from Google Sheets with automated email genera
 
 # 2. DATA PROCESSING
 try:
-    df = load_data()
-    
-    # Pre-process
-    df['Txn Date (Cash Basis)'] = pd.to_datetime(df['Txn Date (Cash Basis)'], errors='coerce')
-    df['Amount (NPR)'] = df['Amount (NPR)'].apply(parse_amount)
-    df['MonthKey'] = df['Txn Date (Cash Basis)'].dt.to_period('M')
-
-    # --- Opening Balances ---
-    # Assuming Opening Balances are static or in the first few rows independently.
-    # We'll extract them once.
-    opening_balances = {
-        'NMB': 0,
-        'NBL': 0,
-        'Petty Cash': 0
-    }
-    
-    # Scan for opening balances (naive: first non-null occurrence)
-    for index, row in df.iterrows():
-        acc = row.get('Account Name')
-        bal = row.get('Opening Balance (AUD)')
-        if acc in opening_balances and pd.notna(bal) and opening_balances[acc] == 0:
-            opening_balances[acc] = parse_amount(bal)
+    # Month switching only reads from this cached cube
+    month_cube = load_month_cube()
 
     # 3. CONTROLS
-    all_months = sorted(df['MonthKey'].dropna().unique(), reverse=True)
+    all_months = month_cube['months']
     
     col_ctrl, col_refresh = st.columns([3, 1])
     with col_ctrl:
@@ -82,94 +62,17 @@ try:
             st.rerun()
 
     # 4. CALCULATIONS
-    
-    # Helper to calc current standing up to end of selected month
-    def get_balances_at_month_end(target_month):
-        bals = opening_balances.copy()
-        
-        # Filter all transactions UP TO end of target month
-        mask = df['MonthKey'] <= target_month
-        sub_df = df[mask]
-        
-        for _, row in sub_df.iterrows():
-            amt = abs(row['Amount (NPR)']) # Logic uses absolute flows
-            to_acc = row['To Account']
-            from_acc = row['From Account']
-            
-            if to_acc in bals: bals[to_acc] += amt
-            if from_acc in bals: bals[from_acc] -= amt
-            
-        return bals
-
-    # Helper to calc monthly metrics
-    def get_monthly_metrics(month):
-        mask = df['MonthKey'] == month
-        sub = df[mask]
-        
-        expenses = 0
-        income = 0
-        wise = 0
-        exp_brk = {}
-        wise_brk = {}
-        inc_brk = {} # New Income Breakdown
-        
-        for _, row in sub.iterrows():
-            amt = parse_amount(row['Amount (NPR)'])
-            abs_amt = abs(amt)
-            to_acc = row['To Account']
-            from_acc = row['From Account']
-            cat = row.get('Category', '') or 'Other'
-            desc = str(row.get('Description', ''))
-            
-            # Expenses
-            if to_acc == 'Expense':
-                expenses += abs_amt
-                exp_brk[cat] = exp_brk.get(cat, 0) + abs_amt
-            
-            # Income
-            if from_acc == 'Income':
-                income += amt
-                # Breakdown by Category (e.g. IELTS, Commission)
-                inc_brk[cat] = inc_brk.get(cat, 0) + amt
-                
-            # Wise
-            if from_acc == 'Wise':
-                wise += amt
-                # Logic: Categorize
-                w_cat = 'Other'
-                txt = (str(cat) + ' ' + desc).lower()
-                if 'sales' in txt: w_cat = 'Sales'
-                elif 'ielts' in txt: w_cat = 'IELTS'
-                elif 'commission' in txt: w_cat = 'Commission'
-                # Fallback to category if it's not generic 'Transfer'
-                elif cat and cat != 'Transfer': w_cat = cat
-                
-                wise_brk[w_cat] = wise_brk.get(w_cat, 0) + amt
-                
-        return {
-            'expenses': expenses,
-            'income': income,
-            'wise': wise,
-            'expense_breakdown': exp_brk,
-            'wise_breakdown': wise_brk,
-            'income_breakdown': inc_brk,
-            'net_balance': income - expenses
-        }
-
-    curr_metrics = get_monthly_metrics(selected_month)
-    curr_balances = get_balances_at_month_end(selected_month)
+    month_data = month_cube['by_month'][selected_month]
+    curr_metrics = month_data['metrics']
+    curr_balances = month_data['balances']
 
     # Comparison (Previous Month)
     prev_month = selected_month - 1
-    prev_metrics = get_monthly_metrics(prev_month)
-    
-    def get_diff(curr, prev):
-        if prev == 0: return 0
-        return ((curr - prev) / prev) * 100
+    prev_metrics = month_data['prev_metrics']
 
-    diff_exp = get_diff(curr_metrics['expenses'], prev_metrics['expenses'])
-    diff_inc = get_diff(curr_metrics['income'], prev_metrics['income'])
-    diff_wise = get_diff(curr_metrics['wise'], prev_metrics['wise'])
+    diff_exp = month_data['deltas']['expenses']
+    diff_inc = month_data['deltas']['income']
+    diff_wise = month_data['deltas']['wise']
 
     # 5. DASHBOARD UI
     c1, c2, c3 = st.columns(3)
@@ -0,0 +1,146 @@
+import concurrent.futures
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import requests
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR = ".sheet_cache"
+DEFAULT_TIMEOUT = 30
+
+_session = requests.Session()
+
+
+def _paths(url, cache_dir):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    base = os.path.join(cache_dir, key)
+    return {"meta": base + ".json", "raw": base + ".csv", "frame": base + ".parquet"}
+
+
+def _write_atomic(path, data):
+    # A unique temp file per writer: threads and Streamlit sessions share one process
+    with tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False
+    ) as f:
+        f.write(data)
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.remove(f.name)
+        raise
+
+
+def _load_meta(paths):
+    if os.path.exists(paths["meta"]) and os.path.exists(paths["raw"]):
+        try:
+            with open(paths["meta"], "r") as f:
+                return json.load(f)
+        except:
+            pass
+    return {}
+
+
+def _load_cached_frame(paths):
+    """Parsed frame from Parquet, falling back to re-parsing the raw CSV"""
+    if os.path.exists(paths["frame"]):
+        try:
+            return pd.read_parquet(paths["frame"])
+        except Exception:
+            pass
+    with open(paths["raw"], "rb") as f:
+        return pd.read_csv(io.BytesIO(f.read()))
+
+
+def _store(paths, raw, frame, meta):
+    _write_atomic(paths["raw"], raw)
+    try:
+        buffer = io.BytesIO()
+        frame.to_parquet(buffer, index=False)
+        _write_atomic(paths["frame"], buffer.getvalue())
+    except Exception:
+        # Mixed-type columns can't always go to Parquet; the raw CSV still serves as cache
+        if os.path.exists(paths["frame"]):
+            os.remove(paths["frame"])
+    _write_atomic(paths["meta"], json.dumps(meta).encode("utf-8"))
+
+
+def fetch_sheet(url, timeout=DEFAULT_TIMEOUT, cache_dir=CACHE_DIR):
+    """
+    Reads a published Google Sheets CSV through an on-disk cache.
+    Sends If-None-Match / If-Modified-Since from the last download and reuses
+    the cached frame on 304, or when the body is unchanged. If Google is slow
+    or down, the last good copy is returned instead of failing.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = _paths(url, cache_dir)
+    meta = _load_meta(paths)
+
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = _session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and meta:
+            return _load_cached_frame(paths)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        if meta:
+            log.warning("Sheet fetch failed (%s), using cached copy from %s", e, meta.get('fetched_at'))
+            return _load_cached_frame(paths)
+        raise
+
+    raw = response.content
+    digest = hashlib.sha1(raw).hexdigest()
+    new_meta = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "sha1": digest,
+        "fetched_at": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+    # Published sheets don't always send validators, so compare the body too
+    if meta.get("sha1") == digest:
+        _write_atomic(paths["meta"], json.dumps(new_meta).encode("utf-8"))
+        return _load_cached_frame(paths)
+
+    frame = pd.read_csv(io.BytesIO(raw))
+    _store(paths, raw, frame, new_meta)
+    return frame
+
+
+def fetch_sheets(urls, timeout=DEFAULT_TIMEOUT, cache_dir=CACHE_DIR):
+    """
+    Fetches and parses several sheets at once, one worker thread per sheet.
+    `urls` maps a name to a URL. Returns (frames, errors) keyed by name, so a
+    single slow or broken sheet doesn't take the others down with it.
+    """
+    frames = {}
+    errors = {}
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(urls)))
+    future_to_name = {
+        executor.submit(fetch_sheet, url, timeout, cache_dir): name
+        for name, url in urls.items()
+    }
+    # Each request already carries its own timeout; this is a backstop for slow parses
+    done, not_done = concurrent.futures.wait(future_to_name, timeout=timeout * 2)
+    for future in done:
+        name = future_to_name[future]
+        try:
+            frames[name] = future.result()
+        except Exception as e:
+            errors[name] = str(e)
+    for future in not_done:
+        errors[future_to_name[future]] = f"Timed out after {timeout * 2}s"
+    # Don't block the page on a straggler
+    executor.shutdown(wait=False, cancel_futures=True)
+    return frames, errors
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import pandas as pd
+
+CACHE_DIR = ".workbook_cache"
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def file_digest(file_bytes, version=""):
+    """Content address of an upload. blake2b is much faster than sha256 on large files"""
+    h = hashlib.blake2b(file_bytes, digest_size=20)
+    h.update(version.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _entry_dir(digest, cache_dir):
+    return os.path.join(cache_dir, digest)
+
+
+def _write_frame(frame, base):
+    try:
+        frame.to_parquet(base + ".parquet")
+    except Exception:
+        # Mixed-type columns (ids typed as both numbers and text) don't fit Parquet
+        if os.path.exists(base + ".parquet"):
+            os.remove(base + ".parquet")
+        frame.to_pickle(base + ".pkl")
+
+
+def _read_frame(base):
+    if os.path.exists(base + ".parquet"):
+        return pd.read_parquet(base + ".parquet")
+    return pd.read_pickle(base + ".pkl")
+
+
+def load(digest, names, cache_dir=CACHE_DIR):
+    """Cached frames for a digest as {name: DataFrame}, or None on a miss"""
+    entry = _entry_dir(digest, cache_dir)
+    if not os.path.isdir(entry):
+        return None
+    try:
+        frames = {name: _read_frame(os.path.join(entry, name)) for name in names}
+    except Exception:
+        # Partial or unreadable entry: drop it and parse again
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+    # Directory mtime doubles as the last-used time for LRU eviction
+    os.utime(entry)
+    return frames
+
+
+def store(digest, frames, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Writes {name: DataFrame} under the digest, then trims the cache to max_bytes"""
+    os.makedirs(cache_dir, exist_ok=True)
+    entry = _entry_dir(digest, cache_dir)
+    # Unique per writer: sessions storing the same upload share one process
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix=os.path.basename(entry) + ".", suffix=".tmp")
+    for name, frame in frames.items():
+        _write_frame(frame, os.path.join(tmp, name))
+    try:
+        os.replace(tmp, entry)
+    except OSError:
+        # Another session stored the same upload first
+        shutil.rmtree(tmp, ignore_errors=True)
+    evict(cache_dir, max_bytes)
+
+
+def _dir_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Removes least recently used entries until the cache fits in max_bytes"""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_dir() and not entry.name.endswith(".tmp"):
+            entries.append((entry.stat().st_mtime, _dir_size(entry.path), entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size